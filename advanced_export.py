@@ -1,7 +1,13 @@
 # Advanced Export Module for MongoDB Sync Tool Pro
 import json
 import csv
-import pandas as pd
+import itertools
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import datetime
 from typing import List, Dict, Any, Callable, Optional
@@ -13,44 +19,87 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 
+CSV_HEADER_MODES = ('sample', 'scan')
+PARALLEL_COMBINE_MODES = ('concat', 'zip')
+
+
 class AdvancedExporter:
-    def __init__(self, client, db_name, collection_name):
+    def __init__(self, client, db_name, collection_name, stages: Optional[List[Dict[str, Any]]] = None):
         self.client = client
         self.db_name = db_name
         self.collection_name = collection_name
         self.collection = client[db_name][collection_name]
+        # Extra aggregation stages appended to every read (e.g. server-side masking)
+        self.stages = stages or []
+        # Columns the last 'sample'-mode CSV export left out of its header
+        self.csv_dropped_fields: List[str] = []
+        # Keys the last Excel export found after its header sample (not in the workbook)
+        self.excel_dropped_fields: List[str] = []
+
+    def _find(self, query: Dict = None, limit: int = None, sort: Optional[List] = None):
+        """Cursor over the documents to export; runs as an aggregation when extra stages are set"""
+        if self.stages:
+            pipeline = [{'$match': query or {}}]
+            if sort:
+                pipeline.append({'$sort': dict(sort)})
+            if limit:
+                pipeline.append({'$limit': limit})
+            return self.collection.aggregate(pipeline + self.stages, allowDiskUse=True)
+        cursor = self.collection.find(query or {})
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return cursor
     
-    def export_to_excel(self, file_path: str, query: Dict = None, limit: int = None, mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None):
-        """Export collection data to Excel format"""
+    # Excel hard limit, including the header row
+    EXCEL_MAX_ROWS = 1048576
+
+    def export_to_excel(self, file_path: str, query: Dict = None, limit: int = None, mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None,
+                        header_sample: int = 1000, batch_size: int = 1000):
+        """Export collection data to Excel format.
+
+        Uses xlsxwriter's constant_memory mode: rows are flushed to disk as they are written,
+        so only one cursor batch is held in memory. Columns and widths come from the first
+        `header_sample` documents; keys that first appear later are left out and listed in
+        `excel_dropped_fields` and in the returned message. Numbers, booleans and dates are
+        written as typed cells. Data rolls over to a new sheet ("Data 2", ...) when a sheet
+        reaches Excel's row limit.
+        """
         try:
-            # Get data
-            cursor = self.collection.find(query or {})
-            if limit:
-                cursor = cursor.limit(limit)
-            
-            documents = list(cursor)
-            if mask:
-                documents = mask(documents)
-            if not documents:
+            batches = self._iter_batches(self._find(query, limit), batch_size)
+            
+            # Read the sample from the head of the same cursor; it is written out first
+            sample = []
+            for batch in batches:
+                if mask:
+                    batch = mask(batch)
+                sample.extend(self._flatten_dict(doc, sep='.') for doc in batch)
+                if len(sample) >= header_sample:
+                    break
+            if not sample:
                 raise ValueError("No documents found to export")
             
-            # Convert to DataFrame
-            df = pd.json_normalize(documents)
-            
-            # Handle ObjectId conversion
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    df[col] = df[col].astype(str)
-            
-            # Create Excel file with formatting
-            with pd.ExcelWriter(file_path, engine='xlsxwriter') as writer:
-                df.to_excel(writer, sheet_name='Data', index=False)
-                
-                # Get workbook and worksheet
-                workbook = writer.book
-                worksheet = writer.sheets['Data']
-                
-                # Add formatting
+            columns = []
+            seen = set()
+            for row in sample[:header_sample]:
+                for key in row:
+                    if key not in seen:
+                        seen.add(key)
+                        columns.append(key)
+            widths = [len(str(c)) for c in columns]
+            for row in sample[:header_sample]:
+                for i, col in enumerate(columns):
+                    if col in row:
+                        widths[i] = max(widths[i], len(str(row[col])))
+            
+            known = set(columns)
+            dropped = set()
+            
+            workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True, 'nan_inf_to_errors': True,
+                                                       'remove_timezone': True})
+            done = False
+            try:
                 header_format = workbook.add_format({
                     'bold': True,
                     'text_wrap': True,
@@ -58,94 +107,417 @@ class AdvancedExporter:
                     'fg_color': '#D7E4BC',
                     'border': 1
                 })
-                
-                # Apply header formatting
-                for col_num, value in enumerate(df.columns.values):
-                    worksheet.write(0, col_num, value, header_format)
-                
-                # Auto-adjust column widths
-                for i, col in enumerate(df.columns):
-                    max_len = max(
-                        df[col].astype(str).map(len).max(),
-                        len(str(col))
-                    ) + 2
-                    worksheet.set_column(i, i, min(max_len, 50))
-                
-                # Add metadata sheet
-                metadata_df = pd.DataFrame({
-                    'Property': ['Database', 'Collection', 'Export Date', 'Total Documents', 'Query Used'],
-                    'Value': [
-                        self.db_name,
-                        self.collection_name,
-                        datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        len(documents),
-                        json.dumps(query or {}, default=str)
-                    ]
-                })
-                metadata_df.to_excel(writer, sheet_name='Metadata', index=False)
+                date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+            
+                def new_sheet(n):
+                    ws = workbook.add_worksheet('Data' if n == 1 else f'Data {n}')
+                    # Auto-adjust column widths (estimated from the sample)
+                    for i, w in enumerate(widths):
+                        ws.set_column(i, i, min(w + 2, 50))
+                    ws.write_row(0, 0, columns, header_format)
+                    return ws
+            
+                def remaining():
+                    for batch in batches:
+                        if mask:
+                            batch = mask(batch)
+                        for doc in batch:
+                            yield self._flatten_dict(doc, sep='.')
+            
+                sheets = 1
+                worksheet = new_sheet(sheets)
+                row_idx = 0
+                total = 0
+                for row in itertools.chain(sample, remaining()):
+                    row_idx += 1
+                    if row_idx >= self.EXCEL_MAX_ROWS:
+                        sheets += 1
+                        worksheet = new_sheet(sheets)
+                        row_idx = 1
+                    dropped.update(row.keys() - known)
+                    for i, col in enumerate(columns):
+                        if col in row:
+                            value = row[col]
+                            if value is None:
+                                continue
+                            if isinstance(value, bool):
+                                worksheet.write_boolean(row_idx, i, value)
+                            elif isinstance(value, (int, float)):
+                                worksheet.write_number(row_idx, i, value)
+                            elif isinstance(value, datetime.datetime) and value.year >= 1900:
+                                # Excel has no dates before 1900; those are written as text
+                                worksheet.write_datetime(row_idx, i, value, date_format)
+                            else:
+                                worksheet.write_string(row_idx, i, self._excel_value(value))
+                    total += 1
             
-            return f"Successfully exported {len(documents)} documents to Excel"
+                # Add metadata sheet
+                meta = workbook.add_worksheet('Metadata')
+                meta.write_row(0, 0, ['Property', 'Value'], header_format)
+                for i, (prop, value) in enumerate([
+                    ('Database', self.db_name),
+                    ('Collection', self.collection_name),
+                    ('Export Date', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+                    ('Total Documents', total),
+                    ('Query Used', json.dumps(query or {}, default=str)),
+                ], start=1):
+                    meta.write(i, 0, prop)
+                    meta.write(i, 1, value)
+                workbook.close()
+                done = True
+            finally:
+                if not done:
+                    # close() also removes the temp files constant_memory streams rows through;
+                    # the truncated workbook it leaves behind is deleted
+                    try:
+                        workbook.close()
+                    except Exception:
+                        pass
+                    Path(file_path).unlink(missing_ok=True)
+            
+            self.excel_dropped_fields = sorted(dropped)
+            if dropped:
+                return (f"Exported {total} documents to Excel; {len(dropped)} fields missing from the sampled header "
+                        f"were dropped: {', '.join(self.excel_dropped_fields)}")
+            return f"Successfully exported {total} documents to Excel"
             
         except Exception as e:
             raise Exception(f"Excel export failed: {str(e)}")
     
-    def export_to_csv(self, file_path: str, query: Dict = None, limit: int = None, fields: Optional[List[str]] = None, mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None):
-        """Export collection data to CSV format"""
-        try:
-            cursor = self.collection.find(query or {})
-            if limit:
-                cursor = cursor.limit(limit)
-            
-            documents = list(cursor)
-            if not documents:
-                raise ValueError("No documents found to export")
-            
-            # Flatten documents and convert ObjectIds
-            flattened_docs = []
-            for doc in documents:
-                flat_doc = self._flatten_dict(doc)
-                # Convert ObjectId to string
-                for key, value in flat_doc.items():
-                    if isinstance(value, ObjectId):
-                        flat_doc[key] = str(value)
-                flattened_docs.append(flat_doc)
-            
-            # Get all unique keys
-            all_keys = set()
-            for doc in flattened_docs:
-                all_keys.update(doc.keys())
+    def _excel_value(self, value) -> str:
+        """Cell text for values without a typed cell (Excel caps cells at 32767 characters)"""
+        return str(value)[:32767]
+    
+    def export_to_csv(self, file_path: str, query: Dict = None, limit: int = None, fields: Optional[List[str]] = None, mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None,
+                      header_mode: str = 'scan', header_sample: int = 1000, batch_size: int = 1000):
+        """Export collection data to CSV format.
 
-            # Determine header fields
-            if fields:
-                # keep only requested fields, maintain given order
-                header_fields = [f for f in fields if f in all_keys]
-                if not header_fields:
-                    header_fields = sorted(all_keys)
-            else:
-                header_fields = sorted(all_keys)
+        Streams in two phases so memory stays flat regardless of collection size:
+        1. header discovery - the flattened keys of every document ('scan', an extra pass) or of
+           the first `header_sample` documents ('sample'), narrowed to `fields` when any of them occurs
+        2. cursor batches are masked, flattened and written row by row
+        In 'sample' mode, keys that first appear after the sample are left out of the file;
+        they are listed in `csv_dropped_fields` and in the returned message.
+        """
+        try:
+            header_fields = self._csv_header(query, limit, fields, mask, header_mode, header_sample, batch_size)
+            track = header_mode == 'sample' and not set(header_fields).intersection(fields or ())
+            known = set(header_fields)
+            dropped = set()
             
-            # Write to CSV
+            count = 0
             with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=header_fields)
+                writer = csv.DictWriter(csvfile, fieldnames=header_fields, restval="", extrasaction='ignore')
                 writer.writeheader()
-                for row in flattened_docs:
-                    # ensure missing keys present as empty
-                    out = {k: row.get(k, "") for k in header_fields}
-                    writer.writerow(out)
+                for batch in self._iter_batches(self._find(query, limit), batch_size):
+                    if mask:
+                        batch = mask(batch)
+                    rows = [self._csv_row(doc) for doc in batch]
+                    if track:
+                        for row in rows:
+                            dropped.update(row.keys() - known)
+                    writer.writerows(rows)
+                    count += len(batch)
+            
+            if not count:
+                raise ValueError("No documents found to export")
             
-            return f"Successfully exported {len(documents)} documents to CSV"
+            self.csv_dropped_fields = sorted(dropped)
+            if dropped:
+                return (f"Exported {count} documents to CSV; {len(dropped)} fields missing from the sampled header "
+                        f"were dropped: {', '.join(self.csv_dropped_fields)}")
+            return f"Successfully exported {count} documents to CSV"
             
         except Exception as e:
             raise Exception(f"CSV export failed: {str(e)}")
     
-    def export_to_pdf_report(self, file_path: str, query: Dict = None, limit: int = 100, mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None):
-        """Export collection data as a formatted PDF report"""
+    def _id_partitions(self, query: Dict = None, partitions: int = 8, method: str = 'sample') -> List[Dict]:
+        """Split the collection into disjoint `_id` ranges and return one filter per range.
+
+        Boundaries come from a `$sample` of ids ('sample', cheap) or `$bucketAuto` over every id
+        ('bucketAuto', exact quantiles, one extra scan). The first range is `$not: {$gte: b1}`
+        so documents whose `_id` has another BSON type are still exported exactly once.
+        """
+        partitions = max(1, int(partitions))
+        if partitions == 1:
+            return [query or {}]
+        if method == 'bucketAuto':
+            buckets = self.collection.aggregate([
+                {'$match': query or {}},
+                {'$bucketAuto': {'groupBy': '$_id', 'buckets': partitions}},
+            ], allowDiskUse=True)
+            bounds = [b['_id']['min'] for b in buckets][1:]
+            if len({type(v) for v in bounds}) > 1:
+                return [query or {}]
+        else:
+            ids = sorted(
+                (d['_id'] for d in self.collection.aggregate([
+                    {'$sample': {'size': partitions * 32}},
+                    {'$project': {'_id': 1}},
+                ])),
+                key=lambda v: (type(v).__name__, v),
+            )
+            # Range splits only make sense within one BSON type
+            if not ids or len({type(v) for v in ids}) > 1:
+                return [query or {}]
+            step = len(ids) / partitions
+            bounds = [ids[int(i * step)] for i in range(1, partitions)]
+        bounds = sorted(set(bounds), key=lambda v: (type(v).__name__, v))
+        if not bounds:
+            return [query or {}]
+        ranges = [{'_id': {'$not': {'$gte': bounds[0]}}}]
+        for lo, hi in zip(bounds, bounds[1:]):
+            ranges.append({'_id': {'$gte': lo, '$lt': hi}})
+        ranges.append({'_id': {'$gte': bounds[-1]}})
+        return [{'$and': [query, r]} if query else r for r in ranges]
+    
+    def _write_part(self, path: str, fmt: str, query: Dict, header: Optional[List[str]], mask, pretty: bool,
+                    standalone: bool, batch_size: int) -> int:
+        """Encode one partition into its own file; `standalone` parts carry the CSV header / JSON brackets"""
+        count = 0
+        with open(path, 'w', newline='', encoding='utf-8') as fh:
+            writer = None
+            if fmt == 'csv':
+                writer = csv.DictWriter(fh, fieldnames=header, restval="", extrasaction='ignore')
+                if standalone:
+                    writer.writeheader()
+            elif fmt == 'json' and standalone:
+                fh.write("[")
+            for batch in self._iter_batches(self._find(query), batch_size):
+                if mask:
+                    batch = mask(batch)
+                if writer:
+                    writer.writerows(self._csv_row(doc) for doc in batch)
+                elif fmt == 'ndjson':
+                    fh.write("".join(self._json_item(doc, False) + "\n" for doc in batch))
+                else:
+                    for doc in batch:
+                        if count:
+                            fh.write(self._json_sep(pretty))
+                        elif standalone:
+                            fh.write(self._json_first(pretty))
+                        fh.write(self._json_item(doc, pretty))
+                        count += 1
+                    continue
+                count += len(batch)
+            if fmt == 'json' and standalone:
+                fh.write(("\n]" if count else "]") if pretty else "]")
+        return count
+    
+    def export_parallel(self, file_path: str, fmt: str = 'csv', query: Dict = None, partitions: int = 8, workers: Optional[int] = None,
+                        combine: str = 'concat', split: str = 'sample', fields: Optional[List[str]] = None, pretty: bool = False,
+                        mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None, batch_size: int = 1000):
+        """Export csv/json/ndjson by reading `_id` partitions on a thread pool.
+
+        Each worker encodes its range into a part file; parts are then concatenated into
+        `file_path` in `_id` order ('concat') or stored as separate files in a zip ('zip').
+        There is no `limit`: partitions are read independently, so a limited export has to use
+        the serial exporters.
+        """
+        fmt = fmt.lower()
+        if fmt not in ('csv', 'json', 'ndjson'):
+            raise ValueError("Parallel export supports csv|json|ndjson")
+        if combine not in PARALLEL_COMBINE_MODES:
+            raise ValueError(f"Invalid combine mode '{combine}'. Use {'|'.join(PARALLEL_COMBINE_MODES)}")
         try:
-            cursor = self.collection.find(query or {})
-            if limit:
-                cursor = cursor.limit(limit)
+            ranges = self._id_partitions(query, partitions, split)
+            header = self._csv_header(query, None, fields, mask) if fmt == 'csv' else None
+            standalone = combine == 'zip'
+            part_dir = tempfile.mkdtemp(prefix="export_parts_")
+            try:
+                paths = [os.path.join(part_dir, f"part-{i:04d}.{fmt}") for i in range(len(ranges))]
+                with ThreadPoolExecutor(max_workers=workers or len(ranges)) as pool:
+                    counts = list(pool.map(
+                        lambda args: self._write_part(args[0], fmt, args[1], header, mask, pretty, standalone, batch_size),
+                        zip(paths, ranges),
+                    ))
+                total = sum(counts)
+                if not total:
+                    raise ValueError("No documents found to export")
+                
+                if combine == 'zip':
+                    with zipfile.ZipFile(file_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                        for path, n in zip(paths, counts):
+                            if n:
+                                zf.write(path, os.path.basename(path))
+                else:
+                    with open(file_path, 'w', newline='', encoding='utf-8') as out:
+                        if fmt == 'csv':
+                            csv.DictWriter(out, fieldnames=header).writeheader()
+                        elif fmt == 'json':
+                            out.write("[\n" if pretty else "[")
+                        first = True
+                        for path, n in zip(paths, counts):
+                            if not n:
+                                continue
+                            if fmt == 'json' and not first:
+                                out.write(self._json_sep(pretty))
+                            with open(path, 'r', newline='', encoding='utf-8') as part:
+                                shutil.copyfileobj(part, out, 1024 * 1024)
+                            first = False
+                        if fmt == 'json':
+                            out.write("\n]" if pretty else "]")
+            finally:
+                shutil.rmtree(part_dir, ignore_errors=True)
+            
+            return f"Successfully exported {total} documents in {len(ranges)} partitions"
             
-            documents = list(cursor)
+        except Exception as e:
+            raise Exception(f"Parallel export failed: {str(e)}")
+    
+    def export_to_parquet(self, file_path: str, query: Dict = None, limit: int = None, mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None,
+                          arrow: bool = False, schema_sample: int = 1000, batch_size: int = 10000, compression: str = 'zstd'):
+        """Export collection data to Apache Parquet (or Arrow IPC file when `arrow` is set).
+
+        The columnar schema is inferred from the first `schema_sample` documents: nested documents
+        become struct columns, arrays become list columns, fields with conflicting types become
+        strings. Each cursor batch is written as its own row group (record batch), so memory
+        stays bounded. Keys that first appear after the sample are left out.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        try:
+            batches = self._iter_batches(self._find(query, limit), batch_size)
+            head = next(batches, None)
+            if head and mask:
+                head = mask(head)
+            if not head:
+                raise ValueError("No documents found to export")
+            rows = [self._arrow_value(doc) for doc in head]
+            row_type = self._arrow_type(pa, rows[:schema_sample])
+            schema = pa.schema([row_type.field(i) for i in range(row_type.num_fields)])
+            
+            if arrow:
+                writer = pa.ipc.new_file(file_path, schema)
+            else:
+                writer = pq.ParquetWriter(file_path, schema, compression=compression)
+            total = 0
+            try:
+                def all_batches():
+                    yield rows
+                    for batch in batches:
+                        if mask:
+                            batch = mask(batch)
+                        yield [self._arrow_value(doc) for doc in batch]
+                
+                for chunk in all_batches():
+                    chunk = [self._arrow_coerce(pa, row, row_type) for row in chunk]
+                    writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+                    total += len(chunk)
+            finally:
+                writer.close()
+            
+            return f"Successfully exported {total} documents to {'Arrow' if arrow else 'Parquet'}"
+            
+        except Exception as e:
+            raise Exception(f"{'Arrow' if arrow else 'Parquet'} export failed: {str(e)}")
+    
+    def _arrow_value(self, value):
+        """BSON values as Arrow-friendly Python values (ObjectId/Decimal128/... become strings)"""
+        if isinstance(value, dict):
+            return {k: self._arrow_value(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._arrow_value(v) for v in value]
+        if value is None or isinstance(value, (bool, int, float, str, bytes, datetime.datetime)):
+            return value
+        return str(value)
+    
+    def _arrow_type(self, pa, values: List[Any]):
+        """Infer one Arrow type for a list of Python values"""
+        present = [v for v in values if v is not None]
+        if not present:
+            return pa.string()
+        if all(isinstance(v, dict) for v in present):
+            keys = []
+            for v in present:
+                keys.extend(k for k in v if k not in keys)
+            if not keys:
+                return pa.string()
+            return pa.struct([pa.field(k, self._arrow_type(pa, [v.get(k) for v in present])) for k in keys])
+        if all(isinstance(v, list) for v in present):
+            return pa.list_(self._arrow_type(pa, [x for v in present for x in v]))
+        if all(isinstance(v, bool) for v in present):
+            return pa.bool_()
+        if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+            return pa.int64()
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+            return pa.float64()
+        if all(isinstance(v, datetime.datetime) for v in present):
+            return pa.timestamp('ms')
+        if all(isinstance(v, bytes) for v in present):
+            return pa.binary()
+        return pa.string()
+    
+    def _arrow_coerce(self, pa, value, typ):
+        """Fit a value to the inferred type; values that cannot fit become null (strings take anything)"""
+        if value is None:
+            return None
+        if pa.types.is_struct(typ):
+            if not isinstance(value, dict):
+                return None
+            return {typ.field(i).name: self._arrow_coerce(pa, value.get(typ.field(i).name), typ.field(i).type) for i in range(typ.num_fields)}
+        if pa.types.is_list(typ):
+            return [self._arrow_coerce(pa, v, typ.value_type) for v in value] if isinstance(value, list) else None
+        if pa.types.is_string(typ):
+            if isinstance(value, str):
+                return value
+            if isinstance(value, (dict, list)):
+                return json.dumps(value, ensure_ascii=False, default=str)
+            return str(value)
+        if isinstance(value, bool):
+            return value if pa.types.is_boolean(typ) else None
+        if pa.types.is_integer(typ):
+            return int(value) if isinstance(value, int) or (isinstance(value, float) and value.is_integer()) else None
+        if pa.types.is_floating(typ):
+            return float(value) if isinstance(value, (int, float)) else None
+        if pa.types.is_timestamp(typ):
+            return value if isinstance(value, datetime.datetime) else None
+        if pa.types.is_binary(typ):
+            return value if isinstance(value, bytes) else None
+        return None
+    
+    def _csv_header(self, query: Dict = None, limit: int = None, fields: Optional[List[str]] = None, mask=None,
+                    header_mode: str = 'scan', header_sample: int = 1000, batch_size: int = 1000) -> List[str]:
+        """CSV columns: sorted flattened keys of a sample ('sample') or of every document ('scan').
+        With `fields`, the requested fields that occur (in the given order); all keys if none does."""
+        if header_mode not in CSV_HEADER_MODES:
+            raise ValueError(f"Invalid header mode '{header_mode}'. Use {'|'.join(CSV_HEADER_MODES)}")
+        keys = set()
+        cursor = self._find(query, header_sample if header_mode == 'sample' else limit)
+        for batch in self._iter_batches(cursor, batch_size):
+            if mask:
+                batch = mask(batch)
+            for doc in batch:
+                keys.update(self._flatten_dict(doc).keys())
+        if fields:
+            # keep only requested fields, maintain given order
+            header_fields = [f for f in fields if f in keys]
+            if header_fields:
+                return header_fields
+        return sorted(keys)
+    
+    def _csv_row(self, doc) -> Dict[str, Any]:
+        flat_doc = self._flatten_dict(doc)
+        # Convert ObjectId to string
+        for key, value in flat_doc.items():
+            if isinstance(value, ObjectId):
+                flat_doc[key] = str(value)
+        return flat_doc
+    
+    def export_to_pdf_report(self, file_path: str, query: Dict = None, limit: int = 100, mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None,
+                             sample_size: int = 10000):
+        """Export collection data as a formatted PDF report.
+
+        Statistics describe the whole collection: the document count, collStats size figures and
+        field frequencies/types from a server-side `$sample` of `sample_size` documents. Only the
+        aggregated results and the sample documents (at most 5, capped by `limit`) are transferred.
+        """
+        try:
+            stats = self._collection_statistics(query, sample_size, mask)
+            documents = list(self._find(query, min(5, limit or 5)))
+            if mask:
+                documents = mask(documents)
             if not documents:
                 raise ValueError("No documents found to export")
             
@@ -176,23 +548,31 @@ class AdvancedExporter:
             story.append(Paragraph(f"<b>Database:</b> {self.db_name}", metadata_style))
             story.append(Paragraph(f"<b>Collection:</b> {self.collection_name}", metadata_style))
             story.append(Paragraph(f"<b>Export Date:</b> {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", metadata_style))
-            story.append(Paragraph(f"<b>Total Documents:</b> {len(documents)}", metadata_style))
+            story.append(Paragraph(f"<b>Total Documents:</b> {stats['total']:,}", metadata_style))
             story.append(Paragraph(f"<b>Query:</b> {json.dumps(query or {}, default=str)}", metadata_style))
+            coll = stats['collStats']
+            if coll:
+                story.append(Paragraph(
+                    f"<b>Data Size:</b> {self._format_bytes(coll.get('size'))} "
+                    f"(avg {self._format_bytes(coll.get('avgObjSize'))}/doc) &nbsp; "
+                    f"<b>Storage:</b> {self._format_bytes(coll.get('storageSize'))} &nbsp; "
+                    f"<b>Indexes:</b> {coll.get('nindexes', 0)} ({self._format_bytes(coll.get('totalIndexSize'))})",
+                    metadata_style))
             story.append(Spacer(1, 20))
             
             # Collection Statistics
             story.append(Paragraph("Collection Statistics", styles['Heading2']))
+            story.append(Paragraph(f"Field frequencies from a random sample of {stats['sampled']:,} documents", styles['Normal']))
+            story.append(Spacer(1, 6))
             
-            # Get field statistics
-            field_stats = self._get_field_statistics(documents)
             stats_data = [['Field Name', 'Type', 'Frequency', 'Sample Value']]
             
-            for field, stats in field_stats.items():
-                sample_value = str(stats['sample'])[:50] + "..." if len(str(stats['sample'])) > 50 else str(stats['sample'])
+            for field, fs in stats['fields'].items():
+                sample_value = str(fs['sample'])[:50] + "..." if len(str(fs['sample'])) > 50 else str(fs['sample'])
                 stats_data.append([
                     field,
-                    stats['type'],
-                    f"{stats['count']}/{len(documents)}",
+                    ", ".join(fs['types']),
+                    f"{fs['count']}/{stats['sampled']} ({fs['count'] * 100 / max(1, stats['sampled']):.0f}%)",
                     sample_value
                 ])
             
@@ -237,7 +617,7 @@ class AdvancedExporter:
             # Build PDF
             doc.build(story)
             
-            return f"Successfully exported PDF report with {len(documents)} documents"
+            return f"Successfully exported PDF report for {stats['total']} documents"
             
         except Exception as e:
             raise Exception(f"PDF export failed: {str(e)}")
@@ -245,9 +625,7 @@ class AdvancedExporter:
     def export_to_json(self, file_path: str, query: Dict = None, limit: int = None, pretty: bool = True, mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None):
         """Export collection data to JSON format"""
         try:
-            cursor = self.collection.find(query or {})
-            if limit:
-                cursor = cursor.limit(limit)
+            cursor = self._find(query, limit)
             
             documents = list(cursor)
             if not documents:
@@ -271,6 +649,56 @@ class AdvancedExporter:
         except Exception as e:
             raise Exception(f"JSON export failed: {str(e)}")
     
+    def iter_json(self, query: Dict = None, limit: int = None, pretty: bool = True, ndjson: bool = False, mask: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None, batch_size: int = 1000):
+        """Yield the export as UTF-8 chunks (one per cursor batch) for streaming responses.
+        JSON output is an array formatted like export_to_json; NDJSON is one document per line.
+        """
+        first = True
+        batches = self._iter_batches(self._find(query, limit), batch_size)
+        # Run the query before the opening bracket so errors surface on the first chunk
+        head = next(batches, None)
+        if not ndjson:
+            yield b"["
+        for batch in itertools.chain([head] if head else [], batches):
+            if mask:
+                batch = mask(batch)
+            parts = []
+            for doc in batch:
+                if ndjson:
+                    parts.append(self._json_item(doc, False) + "\n")
+                    continue
+                parts.append((self._json_first(pretty) if first else self._json_sep(pretty)) + self._json_item(doc, pretty))
+                first = False
+            yield "".join(parts).encode("utf-8")
+        if not ndjson:
+            yield (b"\n]" if not first else b"]") if pretty else b"]"
+    
+    def _json_item(self, doc, pretty: bool) -> str:
+        """One array element formatted as json.dump(..., indent=2) would place it"""
+        json_doc = self._convert_objectids(doc)
+        if pretty:
+            return "  " + json.dumps(json_doc, indent=2, ensure_ascii=False, default=str).replace("\n", "\n  ")
+        return json.dumps(json_doc, ensure_ascii=False, default=str)
+    
+    def _json_sep(self, pretty: bool) -> str:
+        return ",\n" if pretty else ", "
+    
+    def _json_first(self, pretty: bool) -> str:
+        """Written between "[" and the first element, so an empty array stays "[]" """
+        return "\n" if pretty else ""
+    
+    def _iter_batches(self, cursor, batch_size: int = 1000):
+        """Yield lists of at most `batch_size` documents from a cursor"""
+        cursor.batch_size(batch_size)
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
     def _flatten_dict(self, d, parent_key='', sep='_'):
         """Flatten nested dictionary"""
         items = []
@@ -295,21 +723,78 @@ class AdvancedExporter:
         else:
             return obj
     
-    def _get_field_statistics(self, documents):
-        """Get statistics about fields in the collection"""
-        field_stats = {}
+    def _collection_statistics(self, query: Dict = None, sample_size: int = 10000, mask=None) -> Dict[str, Any]:
+        """Collection-wide report figures computed on the server.
+
+        Returns { total, sampled, collStats, fields: { name: { count, types, sample } } } where
+        field counts come from `$sample` + `$objectToArray` + `$group` over top-level fields.
+        """
+        total = self.collection.count_documents(query) if query else self.collection.estimated_document_count()
+        try:
+            coll_stats = self.client[self.db_name].command("collStats", self.collection_name)
+        except Exception:
+            coll_stats = {}
+        
+        pipeline = []
+        if query:
+            pipeline.append({'$match': query})
+        pipeline.append({'$sample': {'size': max(1, int(sample_size))}})
+        # Masking stages run before values are picked as samples
+        pipeline.extend(self.stages)
+        pipeline.append({'$facet': {
+            'n': [{'$count': 'n'}],
+            'fields': [
+                {'$project': {'kv': {'$objectToArray': '$$ROOT'}}},
+                {'$unwind': '$kv'},
+                {'$group': {
+                    '_id': {'k': '$kv.k', 't': {'$type': '$kv.v'}},
+                    'count': {'$sum': 1},
+                    'sample': {'$first': '$kv.v'},
+                }},
+                {'$sort': {'count': -1}},
+            ],
+        }})
+        result = next(self.collection.aggregate(pipeline, allowDiskUse=True), {'n': [], 'fields': []})
+        sampled = result['n'][0]['n'] if result['n'] else 0
         
-        for doc in documents:
-            for field, value in doc.items():
-                if field not in field_stats:
-                    field_stats[field] = {
-                        'count': 0,
-                        'type': type(value).__name__,
-                        'sample': value
-                    }
-                field_stats[field]['count'] += 1
+        fields: Dict[str, Dict[str, Any]] = {}
+        for row in result['fields']:
+            name = row['_id']['k']
+            fs = fields.setdefault(name, {'count': 0, 'types': [], 'sample': None})
+            fs['count'] += row['count']
+            fs['types'].append(row['_id']['t'])
+            if fs['sample'] is None:
+                fs['sample'] = row['sample']
+        if mask and fields:
+            masked = mask([{k: v['sample'] for k, v in fields.items()}])[0]
+            for k, v in fields.items():
+                v['sample'] = masked.get(k)
         
-        return field_stats
+        return {
+            'total': total,
+            'sampled': sampled,
+            'collStats': {k: coll_stats.get(k) for k in ('size', 'avgObjSize', 'storageSize', 'nindexes', 'totalIndexSize')} if coll_stats else {},
+            'fields': dict(sorted(fields.items(), key=lambda kv: (kv[0] != '_id', -kv[1]['count'], kv[0]))),
+        }
+    
+    def _format_bytes(self, n) -> str:
+        if n is None:
+            return "n/a"
+        n = float(n)
+        for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+            if n < 1024 or unit == 'TB':
+                return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+            n /= 1024
+
+
+def gzip_chunks(chunks, level: int = 6):
+    """Gzip-compress an iterable of byte chunks on the fly"""
+    comp = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
 
 # Integration function for the main app
 def create_export_dialog(parent, client, db_name, collection_name):
@@ -21,6 +21,7 @@ from typing import Dict, Any, List
 from collections import defaultdict
 import pandas as pd
 from data_visualization import VisualizationManager
+from sync_engine import NativeSyncEngine
 
 # --- Advanced Theme System ---
 class ThemeManager:
@@ -1869,50 +1870,25 @@ class App(ctk.CTk):
 
     def _execute_sync(self, params):
         """Execute the online sync process"""
+        source_client = dest_client = None
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                dump_dir = Path(temp_dir)
-                dump_path_db = dump_dir / params["source_db"]
-
-                self.after(0, self.log_sync_message, "🔄 [1/4] Dumping from source...")
-                self._run_sync_command([
-                    'mongodump',
-                    f'--uri={params["source_uri"]}',
-                    f'--db={params["source_db"]}',
-                    f'--out={dump_dir}'
-                ])
-
-                self.after(0, self.log_sync_message, "📦 [2/4] Converting BSON to JSON...")
-                for bson_file in dump_path_db.glob("*.bson"):
-                    self._run_sync_command(['bsondump', f'--outFile={bson_file.with_suffix(".json")}', str(bson_file)])
-
-                self.after(0, self.log_sync_message, "📤 [3/4] Importing data...")
-                for json_file in dump_path_db.glob("*.json"):
-                    if not json_file.name.endswith('.metadata.json'):
-                        self._run_sync_command([
-                            'mongoimport',
-                            f'--uri={params["dest_uri"]}',
-                            f'--db={params["dest_db"]}',
-                            f'--collection={json_file.stem}',
-                            '--mode=upsert',
-                            '--drop',
-                            f'--file={json_file}'
-                        ])
-
-                self.after(0, self.log_sync_message, "📋 [4/4] Restoring indexes...")
-                self._run_sync_command([
-                    'mongorestore',
-                    f'--uri={params["dest_uri"]}',
-                    f'--nsFrom={params["source_db"]}.*',
-                    f'--nsTo={params["dest_db"]}.*',
-                    str(dump_dir)
-                ])
-
-                self.after(0, self.log_sync_message, "✅ Sync completed!")
-                self.after(0, messagebox.showinfo, "Success", "Sync process completed successfully!")
+            source_client = MongoClient(params["source_uri"], serverSelectionTimeoutMS=5000)
+            dest_client = MongoClient(params["dest_uri"], serverSelectionTimeoutMS=5000)
+            engine = NativeSyncEngine(
+                source_client, params["source_db"], dest_client, params["dest_db"],
+                log=lambda msg: self.after(0, self.log_sync_message, f"📤 {msg}"),
+            )
+            self.after(0, self.log_sync_message, "🔄 Copying collections from source...")
+            engine.run()
+            totals = engine.totals()
+            self.after(0, self.log_sync_message, f"✅ Sync completed! {totals['docs']} documents copied.")
+            self.after(0, messagebox.showinfo, "Success", "Sync process completed successfully!")
         except Exception as e:
             self.after(0, messagebox.showerror, "Error", f"Error during sync process: {e}")
         finally:
+            for client in (source_client, dest_client):
+                if client is not None:
+                    client.close()
             # Reset sync button to normal state
             self.after(0, self.reset_sync_button)
 
@@ -13,6 +13,7 @@ from .routers import masking as masking_router
 from .routers import backups as backups_router
 from .routers import nl as nl_router
 from .routers import rbac as rbac_router
+from .services.sync_jobs import sync_mgr
 
 # Load env from backend/.env.local if exists
 _env_path = Path(__file__).resolve().parent.parent / ".env.local"
@@ -53,6 +54,12 @@ app.include_router(nl_router.router, prefix="/api")
 app.include_router(rbac_router.router, prefix="/api")
 
 
+@app.on_event("startup")
+def resume_sync_jobs():
+    # Sync jobs interrupted by a restart continue from their per-collection checkpoints
+    sync_mgr.resume_interrupted()
+
+
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
@@ -1,22 +1,23 @@
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import Any, List, Dict
 import json
 from pathlib import Path
 from datetime import datetime
 
 from ..services.mongo import conn_mgr
-from ..utils import to_jsonable
+from ..utils import iter_ndjson, BSONJSONResponse
 
 router = APIRouter(tags=["aggregation"])
 
 
 @router.post("/agg/run")
-def run_aggregation(payload: dict, connection_id: str = Query(..., alias="connectionId")):
+async def run_aggregation(payload: dict, connection_id: str = Query(..., alias="connectionId")):
     """
     Run an aggregation pipeline on a collection.
     payload: { db: str, collection: str, pipeline: List[dict] }
     """
-    client = conn_mgr.get(connection_id)
+    client = conn_mgr.get_async(connection_id)
     if not client:
         raise HTTPException(status_code=404, detail="Connection not found")
     try:
@@ -27,8 +28,30 @@ def run_aggregation(payload: dict, connection_id: str = Query(..., alias="connec
             raise ValueError("Missing db or collection")
         col = client[db][coll]
         cursor = col.aggregate(pipeline, allowDiskUse=True)
-        items = list(cursor)
-        return {"items": [to_jsonable(x) for x in items]}
+        items = await cursor.to_list(length=None)
+        return BSONJSONResponse({"items": items})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/agg/run/stream")
+def stream_aggregation(payload: dict, connection_id: str = Query(..., alias="connectionId"), batch_size: int = Query(500, alias="batchSize")):
+    """
+    Same as /agg/run but streams results as NDJSON while the cursor is iterated.
+    payload: { db: str, collection: str, pipeline: List[dict] }
+    """
+    client = conn_mgr.get(connection_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    try:
+        db = payload.get("db")
+        coll = payload.get("collection")
+        pipeline: List[dict] = payload.get("pipeline") or []
+        if not db or not coll:
+            raise ValueError("Missing db or collection")
+        batch_size = max(1, min(10000, batch_size))
+        cursor = client[db][coll].aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+        return StreamingResponse(iter_ndjson(cursor, batch_size=batch_size), media_type="application/x-ndjson")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -1,22 +1,23 @@
 from fastapi import APIRouter, HTTPException
 from fastapi import Query
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from pathlib import Path
-import shutil
-import tempfile
+import os
 import json
 import datetime
-import subprocess
+import threading
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from ..services.mongo import conn_mgr
+from ..services.archive_pipe import ArchiveDump, zip_chunks
 
 router = APIRouter(tags=["backups"])
 
 BACKUP_DIR = Path(__file__).resolve().parent.parent / "backups"
 BACKUP_DIR.mkdir(exist_ok=True)
 SCHEDULE_FILE = Path(__file__).resolve().parent.parent / "backup_schedule.json"
+# scheduler threads record run results in the schedule file while requests edit it
+_schedule_lock = threading.Lock()
 
 scheduler = BackgroundScheduler()
 if not scheduler.running:
@@ -36,6 +37,19 @@ def _write_schedule(data: Dict[str, Any]):
     SCHEDULE_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), "utf-8")
 
 
+def _record_run(connection_id: str, db: str, error: Optional[str] = None):
+    """Store the outcome of a backup run on its schedule item (lastRun, lastStatus, lastError)."""
+    with _schedule_lock:
+        data = _read_schedule()
+        for item in data.get("items", []):
+            if item.get("connectionId") == connection_id and item.get("db") == db:
+                item["lastRun"] = datetime.datetime.now().isoformat()
+                item["lastStatus"] = "failed" if error else "ok"
+                item["lastError"] = error
+                _write_schedule(data)
+                return
+
+
 def _job_id(connection_id: str, db: str) -> str:
     return f"backup_{connection_id}_{db}"
 
@@ -52,38 +66,34 @@ def _prune_retention(retention: int):
 
 
 def _run_backup(connection_id: str, db: str):
-    client = conn_mgr.get(connection_id)
-    if not client:
-        return
+    # mongodump connects with the URI stored on the schedule item, so the connection id
+    # only names the backup folder and does not need to be open
     BACKUP_DIR.mkdir(exist_ok=True)
     subdir = BACKUP_DIR / connection_id / db
     subdir.mkdir(parents=True, exist_ok=True)
     ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
     out_zip = subdir / f"dump_{ts}.zip"
-    # Use mongodump then zip
+    # mongodump --archive streamed into the ZIP; no dump directory is staged
+    sched = _read_schedule()
+    item = next((i for i in sched.get("items", []) if i.get("connectionId") == connection_id and i.get("db") == db), None)
+    if not item:
+        return
+    if not item.get("uri"):
+        _record_run(connection_id, db, "No URI stored for this schedule")
+        return
+    part = out_zip.with_suffix(".zip.part")
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            dump_dir = Path(temp_dir) / "dump"
-            uri = client.address  # may be tuple, so not directly useful
-            # Better: reconstruct URI is not available. We cannot from client.
-            # Require schedule to store URI; so we read from schedule items.
-            sched = _read_schedule()
-            item = next((i for i in sched.get("items", []) if i.get("connectionId") == connection_id and i.get("db") == db), None)
-            if not item:
-                return
-            uri_value = item.get("uri")
-            cmd = [
-                "mongodump",
-                f"--uri={uri_value}",
-                f"--db={db}",
-                f"--out={str(dump_dir)}",
-            ]
-            subprocess.run(cmd, check=True)
-            # Zip
-            shutil.make_archive(str(out_zip.with_suffix("")), 'zip', dump_dir)
-    except Exception:
-        # ignore failure to keep scheduler robust
+        dump = ArchiveDump(item.get("uri"), db)
+        with open(part, "wb") as fh:
+            for chunk in zip_chunks(dump.chunks(), f"{db}.archive"):
+                fh.write(chunk)
+        os.replace(part, out_zip)
+    except Exception as e:
+        # recorded on the schedule item instead of raised, to keep the scheduler robust
+        part.unlink(missing_ok=True)
+        _record_run(connection_id, db, str(e))
         return
+    _record_run(connection_id, db)
 
 
 @router.post("/backups/schedule")
@@ -97,20 +107,21 @@ def schedule_backup(
 ):
     """Create/replace a scheduled backup for a (connectionId, db) pair."""
     try:
-        data = _read_schedule()
-        items: List[Dict[str, Any]] = data.get("items", [])
-        # remove existing entry
-        items = [i for i in items if not (i.get("connectionId") == connection_id and i.get("db") == db)]
-        items.append({
-            "connectionId": connection_id,
-            "uri": uri,
-            "db": db,
-            "cron": cron,
-            "retention": max(1, int(retention)),
-            "active": bool(active),
-        })
-        data["items"] = items
-        _write_schedule(data)
+        with _schedule_lock:
+            data = _read_schedule()
+            items: List[Dict[str, Any]] = data.get("items", [])
+            # remove existing entry
+            items = [i for i in items if not (i.get("connectionId") == connection_id and i.get("db") == db)]
+            items.append({
+                "connectionId": connection_id,
+                "uri": uri,
+                "db": db,
+                "cron": cron,
+                "retention": max(1, int(retention)),
+                "active": bool(active),
+            })
+            data["items"] = items
+            _write_schedule(data)
         # update scheduler
         job_id = _job_id(connection_id, db)
         try:
@@ -6,27 +6,27 @@ router = APIRouter(tags=["collections"])
 
 
 @router.get("/collections", response_model=List[str])
-def list_collections(
+async def list_collections(
     db: str,
     connection_id: str = Query(..., alias="connectionId"),
 ):
-    client = conn_mgr.get(connection_id)
+    client = conn_mgr.get_async(connection_id)
     if not client:
         raise HTTPException(status_code=404, detail="Connection not found")
     try:
-        return client[db].list_collection_names()
+        return await client[db].list_collection_names()
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/collections/{db}/{collection}/stats")
-def collection_stats(db: str, collection: str, connection_id: str = Query(..., alias="connectionId")):
+async def collection_stats(db: str, collection: str, connection_id: str = Query(..., alias="connectionId")):
     """Return MongoDB collStats for the specified collection."""
-    client = conn_mgr.get(connection_id)
+    client = conn_mgr.get_async(connection_id)
     if not client:
         raise HTTPException(status_code=404, detail="Connection not found")
     try:
-        stats = client[db].command("collStats", collection)
+        stats = await client[db].command("collStats", collection)
         # Ensure serializable
         def to_primitive(v):
             try:
@@ -8,7 +8,7 @@ router = APIRouter(tags=["connections"])
 @router.post("/connect", response_model=ConnectResponse)
 def connect(req: ConnectRequest):
     try:
-        conn_id = conn_mgr.create(req.uri)
+        conn_id = conn_mgr.create(req.uri, max_pool_size=req.max_pool_size, min_pool_size=req.min_pool_size)
         return {"connectionId": conn_id}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Connection failed: {e}")
@@ -19,6 +19,12 @@ def list_connections():
     return {"connections": conn_mgr.list_ids()}
 
 
+@router.get("/connections/pools")
+def connection_pools():
+    """Per-client pool stats: shared connection ids, checked-out connections, wait-queue time, created connections."""
+    return {"pools": conn_mgr.pool_stats()}
+
+
 @router.delete("/connections/{connection_id}")
 def close_connection(connection_id: str):
     ok = conn_mgr.close(connection_id)
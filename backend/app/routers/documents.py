@@ -1,19 +1,36 @@
 from fastapi import APIRouter, HTTPException, Query
-from typing import Any, Dict
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
 from bson import ObjectId
-from pymongo import ASCENDING, DESCENDING
+import bson
+import time
+from pymongo import InsertOne, UpdateOne, UpdateMany, ReplaceOne, DeleteOne, DeleteMany
+from pymongo.errors import BulkWriteError, PyMongoError
 
 from ..services.mongo import conn_mgr
-from ..schemas import QueryRequest, QueryResponse, InsertRequest, UpdateRequest
-from ..utils import to_jsonable
-from .masking import get_active_profile, apply_masking
+from ..services.counts import count_documents_async, count_cache
+from ..services.index_advisor import esr_index, summarize_explain, advise
+from ..services.pagination import (
+    build_sort_spec,
+    keyset_sort_spec,
+    keyset_filter,
+    keyset_projection,
+    encode_cursor,
+    decode_cursor,
+    pop_path,
+)
+from ..schemas import QueryRequest, QueryResponse, InsertRequest, UpdateRequest, BulkWriteRequest
+from ..utils import to_jsonable, iter_ndjson, BSONJSONResponse
+from .masking import get_active_profile, get_masker, mask_documents, mask_stages, masks_path
 
 router = APIRouter(tags=["documents"])
 
 
-@router.post("/documents/query", response_model=QueryResponse)
-def query_documents(payload: QueryRequest, connection_id: str = Query(..., alias="connectionId")):
-    client = conn_mgr.get(connection_id)
+# The page is encoded by BSONJSONResponse, which skips response_model validation;
+# QueryResponse only documents the payload shape in the OpenAPI schema.
+@router.post("/documents/query", response_model=None, responses={200: {"model": QueryResponse}})
+async def query_documents(payload: QueryRequest, connection_id: str = Query(..., alias="connectionId")):
+    client = conn_mgr.get_async(connection_id)
     if not client:
         raise HTTPException(status_code=404, detail="Connection not found")
     try:
@@ -22,83 +39,166 @@ def query_documents(payload: QueryRequest, connection_id: str = Query(..., alias
 
         query = payload.filter or {}
         projection = payload.projection
+        page = max(1, payload.page)
+        page_size = max(1, payload.page_size)
 
         # Count first
-        total = col.count_documents(query)
-
-        # Build cursor
-        cursor = col.find(query, projection)
-
-        # Sort
-        if payload.sort:
-            sort_spec = []
-            for item in payload.sort:
-                if isinstance(item, list) and len(item) == 2:
-                    field, direction = item
-                    sort_spec.append((field, ASCENDING if int(direction) >= 0 else DESCENDING))
+        counted = await count_documents_async(col, connection_id, query, payload.count_mode, payload.count_cap)
+
+        use_keyset = payload.keyset or bool(payload.cursor)
+        find_filter = query
+        skip = 0
+        if use_keyset:
+            # Keyset mode: seek past the last-seen sort key + _id instead of skipping
+            sort_spec = keyset_sort_spec(payload.sort)
+            if payload.cursor:
+                find_filter = keyset_filter(query, sort_spec, decode_cursor(payload.cursor, sort_spec))
+            projection, strip = keyset_projection(projection, sort_spec)
+        else:
+            sort_spec = build_sort_spec(payload.sort)
+            strip = []
+            skip = (page - 1) * page_size
+
+        # Masking pushdown runs the page as an aggregation ending in the masking stages.
+        # Not used when a masked field is a keyset sort key (the token needs the real value).
+        profile = get_active_profile()
+        stages = mask_stages(profile)
+        if stages and use_keyset and any(masks_path(profile, f) for f, _ in sort_spec):
+            stages = []
+        if stages and _find_only_projection(projection):
+            stages = []
+        if stages:
+            cursor = col.aggregate(_as_pipeline(find_filter, projection, sort_spec, skip, page_size) + stages)
+        else:
+            cursor = col.find(find_filter, projection)
             if sort_spec:
                 cursor = cursor.sort(sort_spec)
+            cursor = cursor.skip(skip).limit(page_size)
 
-        # Pagination
-        page = max(1, payload.page)
-        page_size = max(1, payload.page_size)
-        skip = (page - 1) * page_size
-        import time
         t0 = time.perf_counter()
-        items = list(cursor.skip(skip).limit(page_size))
+        items = await cursor.to_list(length=page_size)
         exec_ms = int((time.perf_counter() - t0) * 1000)
 
-        # Simple index suggestion: use filter fields (1) + sort fields
+        next_cursor = None
+        if use_keyset and len(items) == page_size:
+            next_cursor = encode_cursor(items[-1], sort_spec)
+        for doc in items:
+            for field in strip:
+                pop_path(doc, field)
+
+        # Index suggestion from filter/sort shape (Equality-Sort-Range); /documents/explain checks it against the plan
         suggestion = None
         try:
-            filter_keys = list(query.keys()) if isinstance(query, dict) else []
-            sort_keys = []
-            if payload.sort:
-                for item in payload.sort:
-                    if isinstance(item, list) and len(item) == 2:
-                        sort_keys.append((item[0], 1 if int(item[1]) >= 0 else -1))
-            if filter_keys or sort_keys:
-                idx_keys: list[tuple[str, int]] = []
-                for k in filter_keys:
-                    if k != "_id":
-                        idx_keys.append((k, 1))
-                idx_keys.extend(sort_keys)
-                if idx_keys:
-                    suggestion = {
-                        "keys": idx_keys,
-                        "note": "Heuristic: filter fields first, then sort fields"
-                    }
+            idx_keys = esr_index(query, build_sort_spec(payload.sort))
+            if idx_keys:
+                suggestion = {
+                    "keys": idx_keys,
+                    "note": "ESR order: equality fields, then sort fields, then range fields. Use /documents/explain to verify",
+                }
         except Exception:
             pass
 
-        # Apply masking if active
-        profile = get_active_profile()
-        if profile and profile.get("active"):
-            items = [apply_masking(doc, profile) for doc in items]
-        items_json = [to_jsonable(doc) for doc in items]
-        return {
-            "total": total,
+        # Apply masking if active (and not already done on the server)
+        if profile and profile.get("active") and not stages:
+            items = mask_documents(items, profile)
+        return BSONJSONResponse({
+            "total": counted["total"],
+            "totalKind": counted["totalKind"],
+            "totalCached": counted["totalCached"],
+            "totalAsOf": counted["totalAsOf"],
             "page": page,
             "pageSize": page_size,
-            "items": items_json,
+            "items": items,
+            "nextCursor": next_cursor,
             "executionMs": exec_ms,
             "indexSuggestion": suggestion,
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/documents/{db}/{collection}/{doc_id}")
-def get_document(db: str, collection: str, doc_id: str, connection_id: str = Query(..., alias="connectionId")):
+@router.post("/documents/explain")
+async def explain_query(payload: QueryRequest, connection_id: str = Query(..., alias="connectionId")):
+    """Run the page query with explain("executionStats") and advise on indexes.
+    Returns { plan: { stages, collscan, ixscan, inMemorySort, docsExamined, ... }, advice: { keys, status, ... } }.
+    """
+    client = conn_mgr.get_async(connection_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    try:
+        query = payload.filter or {}
+        sort_spec = build_sort_spec(payload.sort)
+        page = max(1, payload.page)
+        page_size = max(1, payload.page_size)
+        cmd: Dict[str, Any] = {"find": payload.collection, "filter": query}
+        if payload.projection:
+            cmd["projection"] = payload.projection
+        if sort_spec:
+            cmd["sort"] = dict(sort_spec)
+        cmd["skip"] = (page - 1) * page_size
+        cmd["limit"] = page_size
+        db = client[payload.db]
+        explain = await db.command("explain", cmd, verbosity="executionStats")
+        indexes = await db[payload.collection].list_indexes().to_list(length=None)
+        plan = summarize_explain(explain)
+        return to_jsonable({
+            "plan": plan,
+            "advice": advise(query, sort_spec, indexes, plan),
+            "indexes": [{"name": i.get("name"), "key": list(i.get("key", {}).items())} for i in indexes],
+        })
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/documents/query/stream")
+def stream_documents(
+    payload: QueryRequest,
+    connection_id: str = Query(..., alias="connectionId"),
+    limit: Optional[int] = Query(None),
+    batch_size: int = Query(500, alias="batchSize"),
+):
+    """Stream every document matching filter/projection/sort as NDJSON (one JSON document per line).
+    Pagination fields are ignored; use `limit` to cap the number of documents.
+    """
     client = conn_mgr.get(connection_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    try:
+        col = client[payload.db][payload.collection]
+        batch_size = max(1, min(10000, batch_size))
+        sort_spec = build_sort_spec(payload.sort)
+        profile = get_active_profile()
+        stages = mask_stages(profile)
+        if stages and _find_only_projection(payload.projection):
+            stages = []
+        if stages:
+            pipeline = _as_pipeline(payload.filter or {}, payload.projection, sort_spec, 0, max(1, limit) if limit else None)
+            cursor = col.aggregate(pipeline + stages, batchSize=batch_size)
+        else:
+            cursor = col.find(payload.filter or {}, payload.projection).batch_size(batch_size)
+            if sort_spec:
+                cursor = cursor.sort(sort_spec)
+            if limit:
+                cursor = cursor.limit(max(1, limit))
+        transform = get_masker(profile).mask if profile and not stages else None
+        return StreamingResponse(iter_ndjson(cursor, transform, batch_size), media_type="application/x-ndjson")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/documents/{db}/{collection}/{doc_id}")
+async def get_document(db: str, collection: str, doc_id: str, connection_id: str = Query(..., alias="connectionId")):
+    client = conn_mgr.get_async(connection_id)
     if not client:
         raise HTTPException(status_code=404, detail="Connection not found")
     try:
         col = client[db][collection]
-        doc = col.find_one({"_id": ObjectId(doc_id)})
+        doc = await col.find_one({"_id": ObjectId(doc_id)})
         if not doc:
             raise HTTPException(status_code=404, detail="Document not found")
-        return to_jsonable(doc)
+        return BSONJSONResponse(doc)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -111,6 +211,7 @@ def insert_document(payload: InsertRequest, connection_id: str = Query(..., alia
     try:
         col = client[payload.db][payload.collection]
         res = col.insert_one(_from_jsonable(payload.document))
+        count_cache.invalidate(connection_id, payload.db, payload.collection)
         return {"insertedId": str(res.inserted_id)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -128,6 +229,7 @@ def update_document(db: str, collection: str, doc_id: str, payload: UpdateReques
         if "_id" in doc:
             doc.pop("_id")
         res = col.update_one({"_id": ObjectId(doc_id)}, {"$set": doc})
+        count_cache.invalidate(connection_id, db, collection)
         return {"matched": res.matched_count, "modified": res.modified_count}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -141,11 +243,40 @@ def delete_document(db: str, collection: str, doc_id: str, connection_id: str =
     try:
         col = client[db][collection]
         res = col.delete_one({"_id": ObjectId(doc_id)})
+        count_cache.invalidate(connection_id, db, collection)
         return {"deleted": res.deleted_count}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _find_only_projection(projection: Optional[Dict[str, Any]]) -> bool:
+    """True if the projection uses operators only find() accepts ($, $elemMatch, $slice).
+
+    These are invalid or mean something else in $project, so such queries skip the
+    aggregation pushdown and are masked in Python instead.
+    """
+    for key, value in (projection or {}).items():
+        if key == "$" or key.endswith(".$"):
+            return True
+        if isinstance(value, dict) and ("$elemMatch" in value or "$slice" in value):
+            return True
+    return False
+
+
+def _as_pipeline(match: Dict[str, Any], projection: Optional[Dict[str, Any]], sort_spec, skip: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Equivalent aggregation pipeline for a find(filter, projection).sort().skip().limit()."""
+    pipeline: List[Dict[str, Any]] = [{"$match": match}]
+    if sort_spec:
+        pipeline.append({"$sort": dict(sort_spec)})
+    if skip:
+        pipeline.append({"$skip": skip})
+    if limit:
+        pipeline.append({"$limit": limit})
+    if projection:
+        pipeline.append({"$project": projection})
+    return pipeline
+
+
 def _from_jsonable(doc: Dict[str, Any]) -> Dict[str, Any]:
     """Convert _id string to ObjectId if present, leave others as-is."""
     d = dict(doc)
@@ -170,6 +301,115 @@ def delete_many(payload: QueryRequest, connection_id: str = Query(..., alias="co
         col = client[payload.db][payload.collection]
         query = payload.filter or {}
         res = col.delete_many(query)
+        count_cache.invalidate(connection_id, payload.db, payload.collection)
         return {"deleted": res.deleted_count}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+# Server limit on operations per write command
+_MAX_BATCH_OPS = 100000
+
+
+def _to_write_op(op: Dict[str, Any]):
+    """Translate one JSON bulk op into a pymongo write model. Returns (model, bson_size)."""
+    kind = op.get("op")
+    filt = _from_jsonable(op.get("filter") or {})
+    if kind == "insert":
+        doc = _from_jsonable(op.get("document") or {})
+        return InsertOne(doc), len(bson.encode(doc))
+    if kind == "update":
+        update = op.get("update")
+        if not update:
+            raise ValueError("update op requires 'update'")
+        cls = UpdateMany if op.get("multi") else UpdateOne
+        size = len(bson.encode({"q": filt, "u": update if isinstance(update, dict) else {"p": update}}))
+        return cls(filt, update, upsert=bool(op.get("upsert"))), size
+    if kind == "replace":
+        repl = _from_jsonable(op.get("replacement") or {})
+        repl.pop("_id", None)
+        return ReplaceOne(filt, repl, upsert=bool(op.get("upsert"))), len(bson.encode({"q": filt, "u": repl}))
+    if kind == "delete":
+        if not filt and not op.get("multi"):
+            raise ValueError("delete op requires a filter")
+        cls = DeleteMany if op.get("multi") else DeleteOne
+        return cls(filt), len(bson.encode(filt))
+    raise ValueError(f"Unknown op '{kind}'. Use insert|update|replace|delete")
+
+
+@router.post("/documents/bulk")
+def bulk_write(payload: BulkWriteRequest, connection_id: str = Query(..., alias="connectionId")):
+    """Apply mixed insert/update/replace/delete ops with unordered `bulk_write` batches.
+    Batches are cut by encoded BSON size (`batchBytes`); a failing op does not stop the others.
+    Errors are reported per op with its index in the request. A batch that fails as a whole
+    (network error, timeout, ...) is reported once with `index`..`lastIndex`; its ops may or may
+    not have been applied, and the remaining batches still run.
+    """
+    client = conn_mgr.get(connection_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    try:
+        col = client[payload.db][payload.collection]
+        batch_bytes = max(1024, payload.batch_bytes)
+        errors: List[Dict[str, Any]] = []
+        stats = {"inserted": 0, "matched": 0, "modified": 0, "deleted": 0, "upserted": 0}
+        batches = 0
+        failed = 0
+
+        def flush(models: List[Any], indexes: List[int]):
+            nonlocal batches, failed
+            if not models:
+                return
+            batches += 1
+            try:
+                res = col.bulk_write(models, ordered=False)
+                details = res.bulk_api_result
+            except BulkWriteError as bwe:
+                details = bwe.details
+                for err in details.get("writeErrors", []):
+                    errors.append({"index": indexes[err["index"]], "code": err.get("code"), "message": err.get("errmsg")})
+                failed += len(details.get("writeErrors", []))
+            except PyMongoError as e:
+                errors.append({"index": indexes[0], "lastIndex": indexes[-1], "code": getattr(e, "code", None), "message": str(e)})
+                failed += len(indexes)
+                return
+            stats["inserted"] += details.get("nInserted", 0)
+            stats["matched"] += details.get("nMatched", 0)
+            stats["modified"] += details.get("nModified", 0)
+            stats["deleted"] += details.get("nRemoved", 0)
+            stats["upserted"] += details.get("nUpserted", 0)
+
+        t0 = time.perf_counter()
+        models: List[Any] = []
+        indexes: List[int] = []
+        size = 0
+        for i, op in enumerate(payload.ops):
+            try:
+                model, op_size = _to_write_op(op)
+            except Exception as e:
+                errors.append({"index": i, "code": None, "message": str(e)})
+                failed += 1
+                continue
+            if models and (size + op_size > batch_bytes or len(models) >= _MAX_BATCH_OPS):
+                flush(models, indexes)
+                models, indexes, size = [], [], 0
+            models.append(model)
+            indexes.append(i)
+            size += op_size
+        flush(models, indexes)
+        elapsed = time.perf_counter() - t0
+        count_cache.invalidate(connection_id, payload.db, payload.collection)
+
+        errors.sort(key=lambda e: e["index"])
+        applied = len(payload.ops) - failed
+        return {
+            **stats,
+            "ops": len(payload.ops),
+            "failed": failed,
+            "errors": errors,
+            "batches": batches,
+            "elapsedMs": int(elapsed * 1000),
+            "opsPerSec": round(applied / elapsed, 1) if elapsed > 0 else None,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from typing import Optional, Dict, Any
+import itertools
 import tempfile
+import shutil
 import os
 import datetime
 
 from ..services.mongo import conn_mgr
-from .masking import get_active_profile, apply_masking
-from advanced_export import AdvancedExporter
+from ..services.export_jobs import export_mgr, SUFFIXES
+from .masking import get_active_profile, mask_documents, mask_stages
+from advanced_export import AdvancedExporter, CSV_HEADER_MODES, PARALLEL_COMBINE_MODES, gzip_chunks
 
 router = APIRouter(tags=["export"])
 
@@ -17,59 +21,108 @@ def export_collection(
     connection_id: str = Query(..., alias="connectionId"),
     db: str = Query(...),
     collection: str = Query(...),
-    format: str = Query(..., description="excel|csv|json|pdf"),
+    format: str = Query(..., description="excel|csv|json|ndjson|parquet|arrow|pdf"),
     limit: Optional[int] = Query(None),
     pretty: Optional[bool] = Query(True),
     fields: Optional[str] = Query(None, description="CSV only: comma-separated field names"),
+    header_mode: str = Query("scan", alias="headerMode", description="CSV only: scan|sample header discovery"),
+    gzip: bool = Query(False, description="json/ndjson only: gzip the stream"),
+    parallel: int = Query(0, description="csv/json/ndjson: read N _id partitions concurrently (exports with a limit run serially)"),
+    combine: str = Query("concat", description="parallel only: concat|zip"),
     query: Optional[Dict[str, Any]] = None,
 ):
     """
     Export a collection to a file and return it for download.
-    - format: excel|csv|json|pdf
+    json/ndjson are streamed from the cursor straight into the response (no temp file).
+    - format: excel|csv|json|ndjson|parquet|arrow|pdf
     - query: optional MongoDB filter (JSON body or querystring converted)
     """
     client = conn_mgr.get(connection_id)
     if not client:
         raise HTTPException(status_code=404, detail="Connection not found")
 
-    exporter = AdvancedExporter(client, db, collection)
+    # Server-side masking pushdown when the active profile asks for it
+    profile = get_active_profile()
+    stages = mask_stages(profile)
+    if stages:
+        profile = None
+    exporter = AdvancedExporter(client, db, collection, stages=stages)
 
     # Temp file path
     suffix_map = {
         "excel": ".xlsx",
         "csv": ".csv",
         "json": ".json",
+        "ndjson": ".ndjson",
+        "parquet": ".parquet",
+        "arrow": ".arrow",
         "pdf": ".pdf",
     }
     f = format.lower()
     if f not in suffix_map:
-        raise HTTPException(status_code=400, detail="Invalid format. Use excel|csv|json|pdf")
+        raise HTTPException(status_code=400, detail="Invalid format. Use excel|csv|json|ndjson|parquet|arrow|pdf")
+    if header_mode not in CSV_HEADER_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid headerMode. Use {'|'.join(CSV_HEADER_MODES)}")
+    if combine not in PARALLEL_COMBINE_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid combine. Use {'|'.join(PARALLEL_COMBINE_MODES)}")
+    # Partitions are read independently and cannot share a limit, so limited exports run serially
+    use_parallel = parallel > 1 and f in ("csv", "json", "ndjson") and not limit
 
     suffix = suffix_map[f]
     ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
     safe_name = f"{db}_{collection}_{ts}{suffix}"
+
+    # Prepare masking hook if profile active
+    def mask_hook(docs):
+        if not profile:
+            return docs
+        return mask_documents(docs, profile)
+
+    if f in ("json", "ndjson") and not use_parallel:
+        try:
+            chunks = exporter.iter_json(query or {}, limit, pretty=bool(pretty), ndjson=(f == "ndjson"), mask=mask_hook if profile else None)
+            if gzip:
+                chunks = gzip_chunks(chunks)
+                safe_name += ".gz"
+            # Pull the first chunk now so query errors still surface as a 400 (an empty NDJSON export has none)
+            first = next(chunks, b"")
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        media = "application/gzip" if gzip else ("application/x-ndjson" if f == "ndjson" else "application/json")
+        headers = {"Content-Disposition": f"attachment; filename=\"{safe_name}\""}
+        return StreamingResponse(itertools.chain([first], chunks), media_type=media, headers=headers)
+
+    if use_parallel and combine == "zip":
+        safe_name += ".zip"
     tmp_dir = tempfile.mkdtemp(prefix="export_")
     out_path = os.path.join(tmp_dir, safe_name)
-
+    extra_headers: Dict[str, str] = {}
     try:
-        # Prepare masking hook if profile active
-        profile = get_active_profile()
-        def mask_hook(docs):
-            if not profile:
-                return docs
-            return [apply_masking(d, profile) for d in docs]
-        if f == "excel":
+        if use_parallel:
+            fields_list = [s.strip() for s in fields.split(',') if s.strip()] if fields else None
+            exporter.export_parallel(out_path, f, query or {}, partitions=min(parallel, 64), combine=combine,
+                                     fields=fields_list, pretty=bool(pretty), mask=mask_hook if profile else None)
+            media = "application/zip" if combine == "zip" else {
+                "csv": "text/csv", "json": "application/json", "ndjson": "application/x-ndjson",
+            }[f]
+        elif f == "excel":
             exporter.export_to_excel(out_path, query or {}, limit, mask=mask_hook if profile else None)
             media = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            if exporter.excel_dropped_fields:
+                # keys first seen after the sampled header; their values are not in the workbook
+                extra_headers["X-Dropped-Fields"] = ",".join(exporter.excel_dropped_fields)
         elif f == "csv":
             fields_list = None
             if fields:
                 fields_list = [s.strip() for s in fields.split(',') if s.strip()]
-            exporter.export_to_csv(out_path, query or {}, limit, fields=fields_list, mask=mask_hook if profile else None)
+            exporter.export_to_csv(out_path, query or {}, limit, fields=fields_list, mask=mask_hook if profile else None, header_mode=header_mode)
             media = "text/csv"
-        elif f == "json":
-            exporter.export_to_json(out_path, query or {}, limit, pretty=pretty, mask=mask_hook if profile else None)
-            media = "application/json"
+            if exporter.csv_dropped_fields:
+                # sample-mode header missed these columns; their values are not in the file
+                extra_headers["X-Dropped-Fields"] = ",".join(exporter.csv_dropped_fields)
+        elif f in ("parquet", "arrow"):
+            exporter.export_to_parquet(out_path, query or {}, limit, mask=mask_hook if profile else None, arrow=(f == "arrow"))
+            media = "application/vnd.apache.parquet" if f == "parquet" else "application/vnd.apache.arrow.file"
         elif f == "pdf":
             exporter.export_to_pdf_report(out_path, query or {}, limit or 100, mask=mask_hook if profile else None)
             media = "application/pdf"
@@ -80,8 +133,155 @@ def export_collection(
             out_path,
             media_type=media,
             filename=safe_name,
+            headers=extra_headers,
+            background=BackgroundTask(shutil.rmtree, tmp_dir, ignore_errors=True),
         )
     except HTTPException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
         raise
+    except Exception as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _job_masking():
+    """(mask hook, pushdown stages) for the active masking profile"""
+    profile = get_active_profile()
+    stages = mask_stages(profile)
+    if stages or not profile:
+        return None, stages
+    return (lambda docs: mask_documents(docs, profile)), stages
+
+
+@router.post("/export/jobs")
+def create_export_job(
+    connection_id: str = Query(..., alias="connectionId"),
+    db: str = Query(...),
+    collection: str = Query(...),
+    format: str = Query(..., description="excel|csv|json|ndjson|parquet|arrow|pdf"),
+    limit: Optional[int] = Query(None),
+    pretty: Optional[bool] = Query(False),
+    fields: Optional[str] = Query(None, description="CSV only: comma-separated field names"),
+    query: Optional[Dict[str, Any]] = None,
+):
+    """
+    Start an export in the background and return its job id.
+    csv/json/ndjson jobs checkpoint the last exported _id after every batch and can be resumed.
+    """
+    client = conn_mgr.get(connection_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    f = format.lower()
+    if f not in SUFFIXES:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Use {'|'.join(SUFFIXES)}")
+    try:
+        mask, stages = _job_masking()
+        fields_list = [s.strip() for s in fields.split(',') if s.strip()] if fields else None
+        job = export_mgr.create(client, connection_id, db, collection, f, query or {}, limit, bool(pretty), fields_list, mask, stages)
+        return {"id": job.id, "status": job.status}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/export/jobs")
+def list_export_jobs():
+    return {"jobs": export_mgr.list()}
+
+
+@router.get("/export/jobs/{job_id}")
+def get_export_job(job_id: str):
+    job = export_mgr.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.status_dict()
+
+
+@router.post("/export/jobs/{job_id}/cancel")
+def cancel_export_job(job_id: str):
+    if not export_mgr.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"ok": True}
+
+
+@router.post("/export/jobs/{job_id}/resume")
+def resume_export_job(job_id: str, connection_id: Optional[str] = Query(None, alias="connectionId")):
+    """Continue a cancelled/failed/interrupted job from its checkpoint (optionally on a new connection)."""
+    job = export_mgr.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if connection_id:
+        job.connection_id = connection_id
+    client = conn_mgr.get(job.connection_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    try:
+        mask, stages = _job_masking()
+        export_mgr.resume(job_id, client, mask, stages)
+        return {"id": job.id, "status": job.status}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/export/jobs/{job_id}")
+def delete_export_job(job_id: str):
+    if not export_mgr.delete(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"ok": True}
+
+
+_MEDIA = {
+    "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+    "pdf": "application/pdf",
+}
+
+
+def _iter_file(path, start: int, length: int, chunk: int = 1024 * 1024):
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        while length > 0:
+            data = fh.read(min(chunk, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+@router.get("/export/jobs/{job_id}/download")
+def download_export_job(job_id: str, request: Request):
+    """Download a finished export. Supports single `Range: bytes=start-end` requests (206 Partial Content)."""
+    job = export_mgr.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "success" or not job.path.exists():
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    size = job.path.stat().st_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename=\"{job.filename}\"",
+    }
+    media = _MEDIA.get(job.format, "application/octet-stream")
+    rng = request.headers.get("range")
+    if not rng or not rng.startswith("bytes=") or "," in rng:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(_iter_file(job.path, 0, size), media_type=media, headers=headers)
+    start_s, _, end_s = rng[len("bytes="):].strip().partition("-")
+    try:
+        if start_s:
+            start = int(start_s)
+            end = min(int(end_s), size - 1) if end_s else size - 1
+        else:
+            # suffix range: last N bytes
+            start = max(0, size - int(end_s))
+            end = size - 1
+    except ValueError:
+        raise HTTPException(status_code=416, detail="Invalid Range header")
+    if start > end or start >= size:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(_iter_file(job.path, start, end - start + 1), status_code=206, media_type=media, headers=headers)
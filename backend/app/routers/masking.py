@@ -1,8 +1,15 @@
-from fastapi import APIRouter
-from typing import Any, Dict, List
+from fastapi import APIRouter, HTTPException, Query
+from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
 import json
 from pathlib import Path
 import re
+import threading
+
+from bson.decimal128 import Decimal128
+
+from ..services.mongo import conn_mgr
+from ..utils import to_jsonable
 
 router = APIRouter(tags=["masking"])
 
@@ -12,20 +19,47 @@ _DEFAULT: Dict[str, Any] = {
     "active": False,
     "fields": ["email", "phone", "cardNumber"],
     "strategy": "redact",  # redact | hash
+    "pushdown": False,  # mask on the server via pipeline stages instead of in Python
 }
 
 
-def _read() -> Dict[str, Any]:
-    if not _STORE.exists():
-        return dict(_DEFAULT)
+# Parsed profile cached together with the (mtime_ns, size) of the file it came from
+_cache_lock = threading.Lock()
+_cache: Dict[str, Any] = {"stamp": None, "profile": None}
+
+
+def _stamp() -> Optional[Tuple[int, int]]:
     try:
-        return json.loads(_STORE.read_text("utf-8"))
-    except Exception:
-        return dict(_DEFAULT)
+        st = _STORE.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read() -> Dict[str, Any]:
+    """Return the profile, re-parsing masking_profile.json only when its mtime/size changes."""
+    stamp = _stamp()
+    with _cache_lock:
+        if _cache["profile"] is not None and _cache["stamp"] == stamp:
+            return dict(_cache["profile"])
+    if stamp is None:
+        prof = dict(_DEFAULT)
+    else:
+        try:
+            prof = json.loads(_STORE.read_text("utf-8"))
+        except Exception:
+            prof = dict(_DEFAULT)
+    with _cache_lock:
+        _cache["stamp"] = stamp
+        _cache["profile"] = prof
+    return dict(prof)
 
 
 def _write(p: Dict[str, Any]):
     _STORE.write_text(json.dumps(p, ensure_ascii=False, indent=2), "utf-8")
+    with _cache_lock:
+        _cache["stamp"] = _stamp()
+        _cache["profile"] = dict(p)
 
 
 @router.get("/masking/profile")
@@ -40,11 +74,61 @@ def set_profile(payload: Dict[str, Any]) -> Dict[str, Any]:
         "active": bool(payload.get("active", prof.get("active"))),
         "fields": payload.get("fields", prof.get("fields")),
         "strategy": payload.get("strategy", prof.get("strategy")),
+        "pushdown": bool(payload.get("pushdown", prof.get("pushdown", False))),
     })
     _write(prof)
     return {"ok": True, "profile": prof}
 
 
+_HASHED_RE = re.compile(r"\*\*\*\d{5}")
+
+
+def _comparable(doc: Any) -> Any:
+    # hash placeholders differ between Python and $toHashedIndexKey; compare where they appear
+    if isinstance(doc, dict):
+        return {k: _comparable(v) for k, v in doc.items()}
+    if isinstance(doc, list):
+        return [_comparable(i) for i in doc]
+    if isinstance(doc, str):
+        return _HASHED_RE.sub("***#####", doc)
+    return doc
+
+
+@router.post("/masking/verify")
+def verify_pushdown(
+    connection_id: str = Query(..., alias="connectionId"),
+    db: str = Query(...),
+    collection: str = Query(...),
+    sample: int = Query(200),
+) -> Dict[str, Any]:
+    """
+    Mask a sample of documents both in Python and with the pushdown stages and compare the results.
+    Returns { pushdown, checked, mismatches: [{ _id, python, pushdown }] } (at most 20 mismatches);
+    `pushdown` is false when the active profile is masked in Python anyway.
+    """
+    client = conn_mgr.get(connection_id)
+    if not client:
+        raise HTTPException(status_code=404, detail="Connection not found")
+    prof = dict(_read(), active=True, pushdown=True)
+    stages = mask_stages(prof)
+    if not stages:
+        return {"pushdown": False, "checked": 0, "mismatches": []}
+    try:
+        col = client[db][collection]
+        docs = list(col.aggregate([{"$sample": {"size": max(1, min(sample, 10000))}}]))
+        by_id = {repr(d["_id"]): d for d in col.aggregate([{"$match": {"_id": {"$in": [d["_id"] for d in docs]}}}] + stages)}
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    masker = get_masker(prof)
+    mismatches = []
+    for doc in docs:
+        expected = _comparable(to_jsonable(masker.mask(doc)))
+        got = _comparable(to_jsonable(by_id.get(repr(doc["_id"]))))
+        if expected != got and len(mismatches) < 20:
+            mismatches.append({"_id": to_jsonable(doc["_id"]), "python": expected, "pushdown": got})
+    return {"pushdown": True, "checked": len(docs), "mismatches": mismatches}
+
+
 # Helpers exposed to other routers
 
 def get_active_profile() -> Dict[str, Any] | None:
@@ -52,6 +136,10 @@ def get_active_profile() -> Dict[str, Any] | None:
     return p if p.get("active") else None
 
 
+_PHONE_RE = re.compile(r"\+?\d[\d\s\-]{6,}")
+_CARD_RE = re.compile(r"\d{12,19}")
+
+
 def _mask_value(val: Any, strategy: str) -> Any:
     if val is None:
         return None
@@ -64,27 +152,264 @@ def _mask_value(val: Any, strategy: str) -> Any:
         # email redact
         name, _, domain = s.partition("@")
         return (name[:1] + "***@" + domain) if domain else "***"
-    if re.fullmatch(r"\+?\d[\d\s\-]{6,}", s):
+    if _PHONE_RE.fullmatch(s):
         return s[:2] + "***" + s[-2:]
-    if re.fullmatch(r"\d{12,19}", s):
+    if _CARD_RE.fullmatch(s):
         return "**** **** **** " + s[-4:]
     # default: partially redact
     return s[:2] + "***"
 
 
-def apply_masking(doc: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
-    fields: List[str] = profile.get("fields", [])
-    strategy: str = profile.get("strategy", "redact")
-    def walk(obj: Any):
+_LEAF = object()  # trie marker: the path ending here is masked
+_NUMERIC = (int, float, bool, Decimal128)
+
+
+def _mask_leaf(val: Any, strategy: str, nested: bool = False) -> Any:
+    """Mask the value of a masked field: numbers/null are kept, arrays are masked element-wise
+    (one level) and embedded documents are redacted whole."""
+    if val is None or isinstance(val, _NUMERIC):
+        return val
+    if isinstance(val, list) and not nested:
+        return [_mask_leaf(i, strategy, True) for i in val]
+    if isinstance(val, (dict, list)):
+        return "***"
+    return _mask_value(val, strategy)
+
+
+class _Masker:
+    """
+    Profile compiled for fast masking. Plain names (e.g. "email") match a key at any depth;
+    dotted paths (e.g. "user.email") are matched from the document root via a trie,
+    looking through arrays the way MongoDB paths do.
+    """
+
+    def __init__(self, fields: Tuple[str, ...], strategy: str) -> None:
+        self.strategy = strategy
+        self.names = frozenset(f for f in fields if "." not in f)
+        self.trie: Dict[str, Any] = {}
+        for f in fields:
+            if "." in f:
+                node = self.trie
+                for part in f.split("."):
+                    node = node.setdefault(part, {})
+                node[_LEAF] = True
+
+    def mask(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        return self._walk(doc, self.trie)
+
+    def mask_many(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        walk, trie = self._walk, self.trie
+        return [walk(d, trie) for d in docs]
+
+    def _walk(self, obj: Any, node: Optional[Dict[str, Any]]) -> Any:
         if isinstance(obj, dict):
+            names, strategy = self.names, self.strategy
             out = {}
             for k, v in obj.items():
-                if k in fields and not isinstance(v, (int, float, bool)):
-                    out[k] = _mask_value(v, strategy)
+                child = node.get(k) if node else None
+                if k in names or (child is not None and _LEAF in child):
+                    out[k] = _mask_leaf(v, strategy)
+                elif isinstance(v, (dict, list)):
+                    out[k] = self._walk(v, child)
                 else:
-                    out[k] = walk(v)
+                    out[k] = v
             return out
         if isinstance(obj, list):
-            return [walk(i) for i in obj]
+            return [self._walk(i, node) if isinstance(i, (dict, list)) else i for i in obj]
         return obj
-    return walk(doc)
+
+
+@lru_cache(maxsize=32)
+def _compile(fields: Tuple[str, ...], strategy: str) -> _Masker:
+    return _Masker(fields, strategy)
+
+
+def get_masker(profile: Dict[str, Any]) -> _Masker:
+    return _compile(tuple(profile.get("fields") or []), profile.get("strategy", "redact"))
+
+
+def apply_masking(doc: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+    return get_masker(profile).mask(doc)
+
+
+def mask_documents(docs: List[Dict[str, Any]], profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Mask a batch of documents with one compiled profile."""
+    return get_masker(profile).mask_many(docs)
+
+
+# Server-side pushdown: the same rules as _Masker/_mask_leaf, as aggregation expressions.
+# Profiles of dotted paths only are walked from the document root like the trie with one $set
+# (arrays are looked through with $map, embedded documents rebuilt with $mergeObjects; an array nested
+# directly in an array is redacted whole). Profiles with plain names rebuild the whole document key by
+# key with $objectToArray/$arrayToObject so a name matches at any depth; below MASK_PUSHDOWN_DEPTH
+# levels nested documents and arrays are redacted whole rather than followed.
+# Hashing uses $toHashedIndexKey (MongoDB 6.0+), so hash placeholders differ from the Python ones.
+
+_KEEP_TYPES = ["int", "long", "double", "decimal", "bool", "null"]
+
+
+def _pad5(num_expr: Any) -> Dict[str, Any]:
+    padded = {"$concat": ["00000", {"$toString": num_expr}]}
+    return {"$substrCP": [padded, {"$subtract": [{"$strLenCP": padded}, 5]}, 5]}
+
+
+def _mask_string(value: str, strategy: str) -> Dict[str, Any]:
+    """_mask_value for a scalar that is neither a number nor null"""
+    s = "$$s"
+    if strategy == "hash":
+        masked: Any = {"$concat": ["***", _pad5({"$abs": {"$mod": [{"$toHashedIndexKey": s}, 100000]}})]}
+    else:
+        at = {"$indexOfCP": [s, "@"]}
+        n = {"$strLenCP": s}
+        masked = {"$switch": {
+            "branches": [
+                {"case": {"$gte": [at, 0]}, "then": {"$cond": [
+                    {"$eq": [{"$substrCP": [s, {"$add": [at, 1]}, n]}, ""]},
+                    "***",
+                    {"$concat": [{"$substrCP": [s, 0, 1]}, "***@", {"$substrCP": [s, {"$add": [at, 1]}, n]}]},
+                ]}},
+                {"case": {"$regexMatch": {"input": s, "regex": "^" + _PHONE_RE.pattern + "$"}},
+                 "then": {"$concat": [{"$substrCP": [s, 0, 2]}, "***", {"$substrCP": [s, {"$subtract": [n, 2]}, 2]}]}},
+                {"case": {"$regexMatch": {"input": s, "regex": "^" + _CARD_RE.pattern + "$"}},
+                 "then": {"$concat": ["**** **** **** ", {"$substrCP": [s, {"$subtract": [n, 4]}, 4]}]}},
+            ],
+            "default": {"$concat": [{"$substrCP": [s, 0, 2]}, "***"]},
+        }}
+    return {"$let": {"vars": {"s": {"$convert": {"input": value, "to": "string", "onError": "", "onNull": ""}}}, "in": masked}}
+
+
+def _leaf_expr(value: str, strategy: str, depth: int, nested: bool = False) -> Dict[str, Any]:
+    branches = [
+        {"case": {"$eq": [{"$type": value}, "missing"]}, "then": "$$REMOVE"},
+        {"case": {"$in": [{"$type": value}, _KEEP_TYPES]}, "then": value},
+        {"case": {"$eq": [{"$type": value}, "object"]}, "then": "***"},
+    ]
+    if nested:
+        branches.append({"case": {"$eq": [{"$type": value}, "array"]}, "then": "***"})
+    else:
+        var = f"m{depth}"
+        branches.append({"case": {"$eq": [{"$type": value}, "array"]}, "then": {
+            "$map": {"input": value, "as": var, "in": _leaf_expr(f"$${var}", strategy, depth + 1, True)}
+        }})
+    return {"$switch": {"branches": branches, "default": _mask_string(value, strategy)}}
+
+
+def _field_expr(value: str, node: Dict[str, Any], strategy: str, depth: int) -> Dict[str, Any]:
+    # a masked prefix wins over longer paths below it, as in _Masker._walk
+    if _LEAF in node:
+        return _leaf_expr(value, strategy, depth)
+    return _walk_expr(value, node, strategy, depth)
+
+
+def _walk_expr(value: str, node: Dict[str, Any], strategy: str, depth: int, in_array: bool = False) -> Dict[str, Any]:
+    var = f"w{depth}"
+    if in_array:
+        # arrays directly inside arrays are not followed; redact them rather than risk a leak
+        array_case: Any = "***"
+    else:
+        array_case = {"$map": {"input": value, "as": var, "in": _walk_expr(f"$${var}", node, strategy, depth + 1, True)}}
+    return {"$switch": {
+        "branches": [
+            {"case": {"$eq": [{"$type": value}, "object"]}, "then": {"$mergeObjects": [
+                value, {k: _field_expr(f"{value}.{k}", child, strategy, depth + 1) for k, child in node.items()},
+            ]}},
+            {"case": {"$eq": [{"$type": value}, "array"]}, "then": array_case},
+        ],
+        "default": value,
+    }}
+
+
+MASK_PUSHDOWN_DEPTH = 8  # document levels the plain-name pushdown follows
+
+
+def _trie_paths(node: Dict[str, Any], prefix: str = "") -> Tuple[List[str], List[str]]:
+    """(masked dotted paths, proper prefixes of them) of a _Masker trie"""
+    leaves: List[str] = []
+    inner: List[str] = []
+    for k, child in node.items():
+        if k is _LEAF:
+            continue
+        path = prefix + k
+        if _LEAF in child:
+            leaves.append(path)
+        else:
+            inner.append(path)
+            sub_leaves, sub_inner = _trie_paths(child, path + ".")
+            leaves += sub_leaves
+            inner += sub_inner
+    return leaves, inner
+
+
+def _any_depth_expr(value: str, path: Any, masker: _Masker, depth: int) -> Dict[str, Any]:
+    """_Masker._walk for profiles with plain names. Keys of a document and elements of an array go
+    through one $map as {k, v, p, leaf} items, where p is the dotted path from the root while it can
+    still reach a masked path (the trie node, tracked at run time) and null otherwise."""
+    if depth >= MASK_PUSHDOWN_DEPTH:
+        return {"$cond": [{"$in": [{"$type": value}, ["object", "array"]]}, "***", value]}
+    item, r = f"i{depth}", f"r{depth}"
+    is_object = {"$eq": [{"$type": value}, "object"]}
+    is_array = {"$eq": [{"$type": value}, "array"]}
+    leaf_paths, inner_paths = _trie_paths(masker.trie)
+    key = f"$${item}.k"
+    if leaf_paths:
+        child = {"$cond": [
+            {"$eq": [path, None]}, None, {"$cond": [{"$eq": [path, ""]}, key, {"$concat": [path, ".", key]}]},
+        ]}
+        child_vars = {"c": child}
+        leaf: Any = {"$or": [{"$in": [key, sorted(masker.names)]}, {"$in": ["$$c", leaf_paths]}]}
+        child_path: Any = {"$cond": [{"$in": ["$$c", inner_paths]}, "$$c", None]}
+    else:
+        child_vars = {}
+        leaf = {"$in": [key, sorted(masker.names)]}
+        child_path = None
+    entry: Dict[str, Any] = {"k": key, "v": f"$${item}.v", "p": child_path, "leaf": leaf}
+    items = {"$switch": {
+        "branches": [
+            {"case": is_object, "then": {"$map": {"input": {"$objectToArray": value}, "as": item, "in": (
+                {"$let": {"vars": child_vars, "in": entry}} if child_vars else entry
+            )}}},
+            # array elements stay at the same trie node, as in _Masker._walk
+            {"case": is_array, "then": {"$map": {"input": value, "as": item, "in": {
+                "k": None, "v": f"$${item}", "p": path, "leaf": False,
+            }}}},
+        ],
+        "default": [],
+    }}
+    mapped = {"$map": {"input": items, "as": item, "in": {"k": key, "v": {"$cond": [
+        f"$${item}.leaf",
+        _leaf_expr(f"$${item}.v", masker.strategy, depth),
+        _any_depth_expr(f"$${item}.v", f"$${item}.p", masker, depth + 1),
+    ]}}}}
+    return {"$let": {"vars": {r: mapped}, "in": {"$switch": {
+        "branches": [
+            {"case": is_object, "then": {"$arrayToObject": f"$${r}"}},
+            {"case": is_array, "then": {"$map": {"input": f"$${r}", "as": item, "in": f"$${item}.v"}}},
+        ],
+        "default": value,
+    }}}}
+
+
+def mask_stages(profile: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Pipeline stages that mask the profile's fields on the server.
+    [] when pushdown is off or a field cannot be expressed (empty or $-prefixed parts)."""
+    if not profile or not profile.get("active") or not profile.get("pushdown"):
+        return []
+    fields = [f for f in (profile.get("fields") or []) if f]
+    if not fields or any(not p or p.startswith("$") for f in fields for p in f.split(".")):
+        return []
+    masker = get_masker(profile)
+    if masker.names:
+        return [{"$replaceWith": _any_depth_expr("$$ROOT", "", masker, 0)}]
+    return [{"$set": {k: _field_expr(f"${k}", child, masker.strategy, 0) for k, child in masker.trie.items()}}]
+
+
+def masks_path(profile: Optional[Dict[str, Any]], path: str) -> bool:
+    """True when a masking rule covers `path`, a field below it or one of its parents."""
+    for f in (profile or {}).get("fields") or []:
+        if not f:
+            continue
+        if "." not in f and f in path.split("."):
+            return True
+        if f == path or f.startswith(path + ".") or path.startswith(f + "."):
+            return True
+    return False
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Query
 from typing import Any, Dict, List
 from collections import defaultdict
 from ..services.mongo import conn_mgr
-from ..utils import to_jsonable
+from ..utils import to_jsonable, BSONJSONResponse
 
 router = APIRouter(tags=["schema"])
 
@@ -15,11 +15,11 @@ def _type_name(v: Any) -> str:
 
 
 @router.get("/schema/summary")
-def schema_summary(db: str, collection: str, connection_id: str = Query(..., alias="connectionId"), limit: int = 200):
+async def schema_summary(db: str, collection: str, connection_id: str = Query(..., alias="connectionId"), limit: int = 200):
     """Scan first N docs to infer field types, nullability, and example values.
     Returns a dict of field -> { types: {type: count}, examples: [values], count, nulls }.
     """
-    client = conn_mgr.get(connection_id)
+    client = conn_mgr.get_async(connection_id)
     if not client:
         raise HTTPException(status_code=404, detail="Connection not found")
     try:
@@ -44,7 +44,7 @@ def schema_summary(db: str, collection: str, connection_id: str = Query(..., ali
                     walk(path, v)
             # Do not recurse into arrays deeply for now; count array at the field
 
-        for doc in cursor:
+        async for doc in cursor:
             walk("", doc)
         out: Dict[str, Any] = {}
         for field in counts.keys():
@@ -146,22 +146,23 @@ def schema_diff(payload: Dict[str, Any]):
 
 
 @router.get("/schema/sample")
-def schema_sample(db: str, collection: str, connection_id: str = Query(..., alias="connectionId"), limit: int = 5):
-    client = conn_mgr.get(connection_id)
+async def schema_sample(db: str, collection: str, connection_id: str = Query(..., alias="connectionId"), limit: int = 5):
+    client = conn_mgr.get_async(connection_id)
     if not client:
         raise HTTPException(status_code=404, detail="Connection not found")
     try:
         col = client[db][collection]
-        docs = list(col.find({}, {}).limit(max(1, min(50, limit))))
-        return {"items": [to_jsonable(d) for d in docs]}
+        n = max(1, min(50, limit))
+        docs = await col.find({}, {}).limit(n).to_list(length=n)
+        return BSONJSONResponse({"items": docs})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/stats/field")
-def field_stats(db: str, collection: str, field: str, connection_id: str = Query(..., alias="connectionId"), top: int = 10):
+async def field_stats(db: str, collection: str, field: str, connection_id: str = Query(..., alias="connectionId"), top: int = 10):
     """Return distinct counts and top values for a field; when numeric, also min/max and bucket histogram."""
-    client = conn_mgr.get(connection_id)
+    client = conn_mgr.get_async(connection_id)
     if not client:
         raise HTTPException(status_code=404, detail="Connection not found")
     try:
@@ -172,7 +173,7 @@ def field_stats(db: str, collection: str, field: str, connection_id: str = Query
             {"$sort": {"count": -1}},
             {"$limit": max(1, min(50, top))},
         ]
-        top_vals = list(col.aggregate(pipeline))
+        top_vals = await col.aggregate(pipeline).to_list(length=None)
         # Numeric stats
         numeric_stats = None
         try:
@@ -186,7 +187,8 @@ def field_stats(db: str, collection: str, field: str, connection_id: str = Query
                     "count": {"$sum": 1},
                 }},
             ]
-            numeric_stats = next(col.aggregate(num_pipeline), None)
+            rows = await col.aggregate(num_pipeline).to_list(length=1)
+            numeric_stats = rows[0] if rows else None
         except Exception:
             pass
         return {"top": to_jsonable(top_vals), "numeric": to_jsonable(numeric_stats)}
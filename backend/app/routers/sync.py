@@ -1,15 +1,20 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Literal, Optional, Dict, Any
+import asyncio
+import json
 import tempfile
 import subprocess
-import shutil
-import io
+import itertools
 import zipfile
 from pathlib import Path
 
 from ..services.sync_jobs import sync_mgr
+from ..services.archive_pipe import (
+    ARCHIVE_FORMATS, GZIP_MAGIC, ArchiveDump, find_archive_entry, restore_archive, zip_chunks,
+)
+from ..utils import to_jsonable
 
 router = APIRouter(tags=["sync"])
 
@@ -19,12 +24,23 @@ class StartSyncRequest(BaseModel):
     sourceDb: str = Field(..., alias="source_db")
     destUri: str = Field(..., alias="dest_uri")
     destDb: str = Field(..., alias="dest_db")
+    engine: Literal["native", "tools"] = "native"
+    workers: int = Field(4, ge=1, le=32)
+    batchSize: int = Field(1000, alias="batch_size", ge=1)
+    mode: Literal["full", "cdc", "incremental", "diff"] = "full"
+    watermarkField: str = Field("_id", alias="watermark_field")
+    # checkpoint the last _id after every batch (reads in _id order) so a restart resumes mid-collection
+    checkpointIds: bool = Field(False, alias="checkpoint_ids")
 
 
 @router.post("/sync/start")
 def start_sync(payload: StartSyncRequest):
     try:
-        job = sync_mgr.create(payload.sourceUri, payload.sourceDb, payload.destUri, payload.destDb)
+        job = sync_mgr.create(
+            payload.sourceUri, payload.sourceDb, payload.destUri, payload.destDb,
+            engine=payload.engine, workers=payload.workers, batch_size=payload.batchSize,
+            mode=payload.mode, watermark_field=payload.watermarkField, checkpoint_ids=payload.checkpointIds,
+        )
         return {"id": job.id, "status": job.status}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -39,11 +55,58 @@ def get_sync(job_id: str):
         "id": job.id,
         "status": job.status,
         "error": job.error,
-        "logs": job.logs,
+        "logs": list(job.logs),
+        "logsDropped": job.logs.dropped,
         "progress": getattr(job, "progress", 0),
+        "engine": job.engine,
+        "collections": job.collections(),
+        "mode": job.mode,
+        "phase": job.phase,
+        "cdc": job.cdc_stats(),
+        "watermarks": to_jsonable(job.marks) if job.mode == "incremental" else None,
     }
 
 
+@router.get("/sync/{job_id}/events")
+async def sync_events(job_id: str, request: Request, interval: float = Query(1.0, ge=0.2, le=30.0)):
+    """Server-Sent Events: `log` events (id = log sequence, so `Last-Event-ID` resumes), a `progress`
+    event with the structured telemetry every `interval` seconds, and `end` once the job has finished."""
+    job = sync_mgr.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        seq = int(request.headers.get("last-event-id") or 0)
+    except ValueError:
+        seq = 0
+
+    async def events():
+        nonlocal seq
+        while not await request.is_disconnected():
+            finished = job.finished_at is not None
+            for n, line in job.logs.since(seq):
+                yield f"id: {n}\nevent: log\ndata: {json.dumps(line)}\n\n"
+                seq = n
+            yield f"event: progress\ndata: {json.dumps(to_jsonable(job.telemetry()))}\n\n"
+            if finished:
+                yield "event: end\ndata: {}\n\n"
+                break
+            await asyncio.sleep(interval)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+@router.get("/sync/{job_id}/logs")
+def sync_logs(job_id: str):
+    """Full log of a job (the in-memory buffer only keeps the most recent lines)."""
+    job = sync_mgr.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not job.logs.path.exists():
+        return PlainTextResponse("")
+    return FileResponse(job.logs.path, media_type="text/plain", filename=f"sync-{job_id}.log")
+
+
 @router.get("/sync")
 def list_sync():
     return {"jobs": sync_mgr.list()}
@@ -70,47 +133,55 @@ def _run_cmd(args: list):
 
 
 @router.post("/sync/offline/export")
-def offline_export(uri: str = Form(...), db: str = Form(...)):
-    """Dump 1 database ra ZIP (thư mục output mongodump được nén)"""
+def offline_export(uri: str = Form(...), db: str = Form(...), archive: str = Form("zip")):
+    """Stream 1 database as a mongodump archive: `zip` (ZIP with `<db>.archive`) or `gzip` (`--archive --gzip`).
+    mongodump writes straight into the response, nothing is staged on disk."""
+    if archive not in ARCHIVE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid archive. Use {'|'.join(ARCHIVE_FORMATS)}")
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            out_dir = Path(temp_dir) / "dump"
-            _run_cmd([
-                'mongodump', f'--uri={uri}', f'--db={db}', f'--out={out_dir}'
-            ])
-            # Zip the dump directory
-            mem = io.BytesIO()
-            with zipfile.ZipFile(mem, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
-                for p in out_dir.rglob('*'):
-                    zf.write(p, p.relative_to(out_dir.parent))
-            mem.seek(0)
-            filename = f"{db}_dump.zip"
-            headers = {"Content-Disposition": f"attachment; filename=\"{filename}\""}
-            return StreamingResponse(mem, media_type='application/zip', headers=headers)
-    except HTTPException:
-        raise
+        dump = ArchiveDump(uri, db, gzip=archive == "gzip")
+        chunks = dump.chunks()
+        if archive == "zip":
+            chunks = zip_chunks(chunks, f"{db}.archive")
+            filename, media = f"{db}_dump.zip", "application/zip"
+        else:
+            filename, media = f"{db}.archive.gz", "application/gzip"
+        # Pull the first chunk now so a failing mongodump still surfaces as a 400
+        first = next(chunks)
+    except StopIteration:
+        raise HTTPException(status_code=400, detail="mongodump produced no output")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    headers = {"Content-Disposition": f"attachment; filename=\"{filename}\""}
+    return StreamingResponse(itertools.chain([first], chunks), media_type=media, headers=headers)
 
 
 @router.post("/sync/offline/import")
 def offline_import(file: UploadFile = File(...), dest_uri: str = Form(...), dest_db: str = Form(...)):
-    """Nhận ZIP dump và restore vào DB đích."""
+    """Nhận dump (ZIP thư mục dump, ZIP chứa `.archive`, hoặc `.archive.gz`) và restore vào DB đích."""
     try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            zip_path = Path(temp_dir) / file.filename
-            with open(zip_path, 'wb') as f:
-                shutil.copyfileobj(file.file, f)
-            extract_dir = Path(temp_dir) / "extract"
-            extract_dir.mkdir(parents=True, exist_ok=True)
-            with zipfile.ZipFile(zip_path, 'r') as zf:
-                zf.extractall(extract_dir)
-            # mongorestore: nếu dump chứa tên DB gốc, map sang dest_db
-            # dump structure: dump/<db>/*.bson
-            _run_cmd([
-                'mongorestore', f'--uri={dest_uri}', f'--nsTo={dest_db}.*', str(extract_dir)
-            ])
+        head = file.file.read(2)
+        file.file.seek(0)
+        if head == GZIP_MAGIC:
+            # archive is piped straight from the upload into mongorestore
+            restore_archive(dest_uri, dest_db, file.file, gzip=True)
             return {"ok": True}
+        with zipfile.ZipFile(file.file, 'r') as zf:
+            entry = find_archive_entry(zf)
+            if entry:
+                with zf.open(entry) as src:
+                    restore_archive(dest_uri, dest_db, src)
+                return {"ok": True}
+            with tempfile.TemporaryDirectory() as temp_dir:
+                extract_dir = Path(temp_dir) / "extract"
+                extract_dir.mkdir(parents=True, exist_ok=True)
+                zf.extractall(extract_dir)
+                # mongorestore: nếu dump chứa tên DB gốc, map sang dest_db
+                # dump structure: dump/<db>/*.bson
+                _run_cmd([
+                    'mongorestore', f'--uri={dest_uri}', f'--nsTo={dest_db}.*', str(extract_dir)
+                ])
+                return {"ok": True}
     except HTTPException:
         raise
     except Exception as e:
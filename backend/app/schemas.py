@@ -4,6 +4,8 @@ from pydantic import BaseModel, Field
 
 class ConnectRequest(BaseModel):
     uri: str
+    max_pool_size: Optional[int] = Field(None, alias="maxPoolSize")
+    min_pool_size: Optional[int] = Field(None, alias="minPoolSize")
 
 
 class ConnectResponse(BaseModel):
@@ -18,13 +20,25 @@ class QueryRequest(BaseModel):
     sort: Optional[List[List[Any]]] = None  # e.g., [["field", 1], ["age", -1]]
     page: int = 1
     page_size: int = Field(50, alias="pageSize")
+    # Keyset paging: set `keyset` for the first page, then pass back `nextCursor` as `cursor`
+    keyset: bool = False
+    cursor: Optional[str] = None
+    # Total strategy: exact | auto (estimated for empty filter, cached otherwise) | capped
+    count_mode: str = Field("exact", alias="countMode")
+    count_cap: Optional[int] = Field(None, alias="countCap")
 
 
 class QueryResponse(BaseModel):
     total: int
+    total_kind: str = Field("exact", alias="totalKind")  # exact | cached | estimated | capped
+    total_cached: bool = Field(False, alias="totalCached")
+    total_as_of: Optional[float] = Field(None, alias="totalAsOf")  # epoch seconds the count was taken
     page: int
     page_size: int = Field(..., alias="pageSize")
     items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = Field(None, alias="nextCursor")
+    execution_ms: Optional[int] = Field(None, alias="executionMs")
+    index_suggestion: Optional[Dict[str, Any]] = Field(None, alias="indexSuggestion")
 
 
 class InsertRequest(BaseModel):
@@ -39,6 +53,17 @@ class UpdateRequest(BaseModel):
     document: Dict[str, Any]
 
 
+class BulkWriteRequest(BaseModel):
+    db: str
+    collection: str
+    # Each op: {"op": "insert", "document": {...}}
+    #          {"op": "update", "filter": {...}, "update": {...}, "upsert": false, "multi": false}
+    #          {"op": "replace", "filter": {...}, "replacement": {...}, "upsert": false}
+    #          {"op": "delete", "filter": {...}, "multi": false}
+    ops: List[Dict[str, Any]]
+    batch_bytes: int = Field(8 * 1024 * 1024, alias="batchBytes")
+
+
 class IndexCreateRequest(BaseModel):
     db: str
     collection: str
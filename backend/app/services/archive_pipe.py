@@ -0,0 +1,131 @@
+from collections import deque
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional
+import shutil
+import subprocess
+import threading
+import zipfile
+
+ARCHIVE_FORMATS = ("zip", "gzip")
+CHUNK_SIZE = 1024 * 1024
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _drain(stream, sink: Callable[[str], None]):
+    for raw in iter(stream.readline, b""):
+        sink(raw.decode("utf-8", "replace").rstrip())
+    stream.close()
+
+
+class ArchiveDump:
+    """
+    `mongodump --archive` writing to a pipe; iterate `chunks()` for the archive bytes.
+    Nothing touches the disk. The tool's messages (stderr) are kept in `messages` and passed to `log`.
+    """
+
+    def __init__(self, uri: str, db: str, gzip: bool = False, log: Optional[Callable[[str], None]] = None):
+        args = ["mongodump", f"--uri={uri}", f"--db={db}", "--archive"]
+        if gzip:
+            args.append("--gzip")
+        self.messages: deque = deque(maxlen=200)
+        self._log = log
+        self.proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._reader = threading.Thread(target=_drain, args=(self.proc.stderr, self._message), daemon=True)
+        self._reader.start()
+
+    def _message(self, line: str):
+        self.messages.append(line)
+        if self._log:
+            self._log(line)
+
+    def chunks(self, size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        assert self.proc.stdout is not None
+        try:
+            while True:
+                data = self.proc.stdout.read(size)
+                if not data:
+                    break
+                yield data
+            self.proc.wait()
+            self._reader.join(timeout=5)
+            if self.proc.returncode != 0:
+                raise RuntimeError("mongodump failed: " + "\n".join(list(self.messages)[-5:]))
+        finally:
+            if self.proc.poll() is None:
+                self.proc.terminate()
+            self.proc.stdout.close()
+
+
+class _ChunkSink:
+    # Write-only, unseekable file object: zipfile then streams entries with data descriptors
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts.clear()
+        return out
+
+
+def zip_chunks(chunks: Iterable[bytes], arcname: str) -> Iterator[bytes]:
+    """Wrap a byte stream as a single-entry ZIP, produced on the fly."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        with zf.open(arcname, "w", force_zip64=True) as entry:
+            for chunk in chunks:
+                entry.write(chunk)
+                out = sink.drain()
+                if out:
+                    yield out
+    yield sink.drain()
+
+
+def find_archive_entry(zf: zipfile.ZipFile) -> Optional[str]:
+    """Name of the mongodump archive inside a ZIP written by `zip_chunks`, if any."""
+    return next((n for n in zf.namelist() if n.endswith(".archive")), None)
+
+
+def restore_archive(uri: str, dest_db: str, source: BinaryIO, gzip: bool = False,
+                    log: Optional[Callable[[str], None]] = None) -> List[str]:
+    """
+    Pipe an archive stream into `mongorestore --archive`, renaming every namespace into `dest_db`.
+    Returns the tool output; raises RuntimeError when mongorestore fails.
+    """
+    args = [
+        "mongorestore", f"--uri={uri}", "--archive",
+        "--nsFrom=$db$.$coll$", f"--nsTo={dest_db}.$coll$",
+    ]
+    if gzip:
+        args.append("--gzip")
+    out: List[str] = []
+
+    def collect(line: str):
+        out.append(line)
+        if log:
+            log(line)
+
+    proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    reader = threading.Thread(target=_drain, args=(proc.stdout, collect), daemon=True)
+    reader.start()
+    assert proc.stdin is not None
+    try:
+        shutil.copyfileobj(source, proc.stdin, CHUNK_SIZE)
+    except BrokenPipeError:
+        # mongorestore exited early; its output says why
+        pass
+    finally:
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+    proc.wait()
+    reader.join(timeout=5)
+    if proc.returncode != 0:
+        raise RuntimeError("mongorestore failed: " + "\n".join(out[-5:]))
+    return out
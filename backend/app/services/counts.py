@@ -0,0 +1,115 @@
+from typing import Any, Dict, Optional, Tuple
+from bson import json_util
+import os
+import threading
+import time
+
+
+COUNT_MODES = ("exact", "auto", "capped")
+DEFAULT_COUNT_CAP = 10000
+
+
+class CountCache:
+    """
+    Small in-memory TTL cache for collection counts keyed by the normalized filter.
+    Entries expire after `ttl` seconds; the cache is bounded to `max_entries`.
+    Each entry keeps the wall-clock time it was counted so callers can report its age.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 1024) -> None:
+        self._lock = threading.Lock()
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries: Dict[Tuple, Tuple[float, int, float]] = {}
+
+    @staticmethod
+    def key(conn_id: str, db: str, collection: str, query: Dict[str, Any], cap: Optional[int] = None) -> Tuple:
+        # json_util keeps BSON types apart ({"$oid": ...} vs plain strings). Only the top-level keys are
+        # sorted: their order never matters, but embedded-document equality ({"a": {"x": 1, "y": 2}}) is order-sensitive
+        return (conn_id, db, collection, json_util.dumps({k: query[k] for k in sorted(query)}), cap)
+
+    def get(self, key: Tuple) -> Optional[Tuple[int, float]]:
+        """(count, counted_at epoch seconds) or None when missing/expired"""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(key)
+            if not hit:
+                return None
+            if hit[0] < now:
+                self._entries.pop(key, None)
+                return None
+            return hit[1], hit[2]
+
+    def put(self, key: Tuple, value: int) -> float:
+        with self._lock:
+            if len(self._entries) >= self._max_entries:
+                now = time.monotonic()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] >= now}
+                if len(self._entries) >= self._max_entries:
+                    # drop the entry closest to expiry
+                    self._entries.pop(min(self._entries, key=lambda k: self._entries[k][0]))
+            as_of = time.time()
+            self._entries[key] = (time.monotonic() + self._ttl, value, as_of)
+        return as_of
+
+    def invalidate(self, conn_id: str, db: str, collection: str) -> None:
+        with self._lock:
+            for k in [k for k in self._entries if k[:3] == (conn_id, db, collection)]:
+                self._entries.pop(k, None)
+
+
+count_cache = CountCache(ttl=float(os.getenv("COUNT_CACHE_TTL", "30")))
+
+
+def _capped_limit(mode: str, cap: Optional[int]) -> Optional[int]:
+    if mode not in COUNT_MODES:
+        raise ValueError(f"Invalid countMode. Use {'|'.join(COUNT_MODES)}")
+    return max(1, int(cap or DEFAULT_COUNT_CAP)) if mode == "capped" else None
+
+
+def _result(total: int, limit: Optional[int], as_of: float, cached: bool) -> Dict[str, Any]:
+    # a cached count was exact when taken; the collection may have changed since `totalAsOf`
+    kind = "capped" if limit and total >= limit else ("cached" if cached else "exact")
+    return {"total": total, "totalKind": kind, "totalCached": cached, "totalAsOf": as_of}
+
+
+def count_documents(col, conn_id: str, query: Dict[str, Any], mode: str = "exact", cap: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Count documents for a query using the requested strategy:
+    - exact: `count_documents` on every call
+    - auto: `estimated_document_count` for an empty filter, otherwise a TTL-cached exact count
+    - capped: cached `count_documents(limit=cap)`; the total is "capped" when the cap is reached
+      (cap defaults to DEFAULT_COUNT_CAP)
+    Returns { total, totalKind: exact|cached|estimated|capped, totalCached, totalAsOf }
+    where totalAsOf is the epoch time the count was taken (older than now for cached values).
+    """
+    limit = _capped_limit(mode, cap)
+    if mode == "exact":
+        return _result(col.count_documents(query), None, time.time(), False)
+    if mode == "auto" and not query:
+        return {"total": col.estimated_document_count(), "totalKind": "estimated", "totalCached": False,
+                "totalAsOf": time.time()}
+
+    key = CountCache.key(conn_id, col.database.name, col.name, query, limit)
+    hit = count_cache.get(key)
+    if hit is not None:
+        return _result(hit[0], limit, hit[1], True)
+    total = col.count_documents(query, limit=limit) if limit else col.count_documents(query)
+    return _result(total, limit, count_cache.put(key, total), False)
+
+
+async def count_documents_async(col, conn_id: str, query: Dict[str, Any], mode: str = "exact", cap: Optional[int] = None) -> Dict[str, Any]:
+    """Motor counterpart of `count_documents`; shares the same cache."""
+    limit = _capped_limit(mode, cap)
+    if mode == "exact":
+        return _result(await col.count_documents(query), None, time.time(), False)
+    if mode == "auto" and not query:
+        return {"total": await col.estimated_document_count(), "totalKind": "estimated", "totalCached": False,
+                "totalAsOf": time.time()}
+
+    key = CountCache.key(conn_id, col.database.name, col.name, query, limit)
+    hit = count_cache.get(key)
+    if hit is not None:
+        return _result(hit[0], limit, hit[1], True)
+    total = await (col.count_documents(query, limit=limit) if limit else col.count_documents(query))
+    return _result(total, limit, count_cache.put(key, total), False)
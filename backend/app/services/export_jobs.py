@@ -0,0 +1,369 @@
+import threading
+import csv
+import io
+import os
+import shutil
+import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import uuid
+import time
+
+from bson import json_util
+
+from advanced_export import AdvancedExporter
+from sync_engine import after_id
+
+EXPORT_DIR = Path(__file__).resolve().parent.parent / "exports"
+
+SUFFIXES = {
+    "excel": ".xlsx",
+    "csv": ".csv",
+    "json": ".json",
+    "ndjson": ".ndjson",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+    "pdf": ".pdf",
+}
+# Text formats are written in _id order and checkpointed after every batch
+RESUMABLE = ("csv", "json", "ndjson")
+
+
+class ExportJob:
+    def __init__(
+        self,
+        connection_id: str,
+        db: str,
+        collection: str,
+        fmt: str,
+        query: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        pretty: bool = False,
+        fields: Optional[List[str]] = None,
+        job_id: Optional[str] = None,
+    ):
+        self.id = job_id or str(uuid.uuid4())
+        self.connection_id = connection_id
+        self.db = db
+        self.collection = collection
+        self.format = fmt
+        self.query = query or {}
+        self.limit = limit
+        self.pretty = pretty
+        self.fields = fields
+        ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.filename = f"{db}_{collection}_{ts}{SUFFIXES[fmt]}"
+        self.logs: List[str] = []
+        self.status: str = "pending"  # pending | running | success | error | cancelled | interrupted
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        # checkpoint
+        self.docs_written = 0
+        self.bytes_written = 0
+        self.last_id: Any = None
+        self.header: Optional[List[str]] = None
+        self.total_estimate: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._cancel: bool = False
+        self._run_started: float = 0.0
+        self._run_start_docs = 0
+        self._run_start_bytes = 0
+
+    @property
+    def dir(self) -> Path:
+        return EXPORT_DIR / self.id
+
+    @property
+    def path(self) -> Path:
+        return self.dir / self.filename
+
+    @property
+    def resumable(self) -> bool:
+        return self.format in RESUMABLE
+
+    def log(self, msg: str):
+        ts = time.strftime("%H:%M:%S")
+        self.logs.append(f"[{ts}] {msg}")
+        del self.logs[:-200]
+
+    # Persistence: job.json holds the definition and the last checkpoint
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "connectionId": self.connection_id,
+            "db": self.db,
+            "collection": self.collection,
+            "format": self.format,
+            "query": self.query,
+            "limit": self.limit,
+            "pretty": self.pretty,
+            "fields": self.fields,
+            "filename": self.filename,
+            "status": self.status,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at,
+            "docsWritten": self.docs_written,
+            "bytesWritten": self.bytes_written,
+            "lastId": self.last_id,
+            "header": self.header,
+            "totalEstimate": self.total_estimate,
+        }
+
+    @classmethod
+    def from_record(cls, rec: Dict[str, Any]) -> "ExportJob":
+        job = cls(rec["connectionId"], rec["db"], rec["collection"], rec["format"], rec.get("query"),
+                  rec.get("limit"), rec.get("pretty", False), rec.get("fields"), job_id=rec["id"])
+        job.filename = rec["filename"]
+        job.status = rec.get("status", "interrupted")
+        job.error = rec.get("error")
+        job.created_at = rec.get("createdAt", job.created_at)
+        job.finished_at = rec.get("finishedAt")
+        job.docs_written = rec.get("docsWritten", 0)
+        job.bytes_written = rec.get("bytesWritten", 0)
+        job.last_id = rec.get("lastId")
+        job.header = rec.get("header")
+        job.total_estimate = rec.get("totalEstimate")
+        return job
+
+    def save(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.dir / "job.json.tmp"
+        tmp.write_text(json_util.dumps(self.to_record()), "utf-8")
+        os.replace(tmp, self.dir / "job.json")
+
+    def status_dict(self) -> Dict[str, Any]:
+        running = self.status == "running"
+        elapsed = time.time() - self._run_started if running and self._run_started else 0
+        docs_rate = (self.docs_written - self._run_start_docs) / elapsed if elapsed > 0 else None
+        bytes_rate = (self.bytes_written - self._run_start_bytes) / elapsed if elapsed > 0 else None
+        total = self.total_estimate
+        eta = None
+        if running and total and docs_rate:
+            eta = round(max(0, total - self.docs_written) / docs_rate, 1)
+        if self.status == "success":
+            progress = 100
+        elif total:
+            progress = min(99, int(self.docs_written * 100 / total))
+        else:
+            progress = 0
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "format": self.format,
+            "db": self.db,
+            "collection": self.collection,
+            "filename": self.filename,
+            "docs": self.docs_written,
+            "bytes": self.bytes_written,
+            "total": total,
+            "progress": progress,
+            "docsPerSec": round(docs_rate, 1) if docs_rate is not None else None,
+            "bytesPerSec": round(bytes_rate, 1) if bytes_rate is not None else None,
+            "etaSeconds": eta,
+            "resumable": self.resumable,
+            "lastId": str(self.last_id) if self.last_id is not None else None,
+            "logs": self.logs,
+        }
+
+    def start(self, client, mask: Optional[Callable] = None, stages: Optional[List[Dict[str, Any]]] = None):
+        if self._thread and self._thread.is_alive():
+            return
+        self._cancel = False
+        self.error = None
+        self._thread = threading.Thread(target=self._run, args=(client, mask, stages), daemon=True)
+        self._thread.start()
+
+    def _run(self, client, mask, stages):
+        self.status = "running"
+        self._run_started = time.time()
+        self._run_start_docs = self.docs_written
+        self._run_start_bytes = self.bytes_written
+        self.save()
+        try:
+            exporter = AdvancedExporter(client, self.db, self.collection, stages=stages)
+            if self.total_estimate is None:
+                n = exporter.collection.count_documents(self.query, limit=self.limit) if self.limit else exporter.collection.count_documents(self.query)
+                self.total_estimate = n
+            if self.resumable:
+                self._run_resumable(exporter, mask)
+            else:
+                self._run_whole(exporter, mask)
+            self.status = "success"
+            self.log(f"Export completed: {self.docs_written} documents, {self.bytes_written} bytes.")
+        except Exception as e:
+            if self._cancel:
+                self.status = "cancelled"
+                self.error = "Cancelled by user"
+                self.log("Export cancelled; resume continues from the last checkpoint." if self.resumable else "Export cancelled.")
+            else:
+                self.status = "error"
+                self.error = str(e)
+                self.log(f"ERROR: {e}")
+        finally:
+            self.finished_at = time.time()
+            self.save()
+
+    def _run_whole(self, exporter: AdvancedExporter, mask):
+        # Container formats cannot be appended to, so they always restart from scratch
+        self.docs_written = 0
+        self.log(f"Exporting {self.format} (not resumable)...")
+
+        def checked(batch):
+            # The exporters call the mask hook once per batch, so it doubles as the cancel check
+            if self._cancel:
+                raise RuntimeError("Cancelled")
+            return mask(batch) if mask else batch
+
+        path = str(self.path)
+        if self.format == "excel":
+            exporter.export_to_excel(path, self.query, self.limit, mask=checked)
+        elif self.format in ("parquet", "arrow"):
+            exporter.export_to_parquet(path, self.query, self.limit, mask=checked, arrow=(self.format == "arrow"))
+        elif self.format == "pdf":
+            exporter.export_to_pdf_report(path, self.query, self.limit or 100, mask=checked)
+        if self._cancel:
+            # cancelled after the last batch was read
+            raise RuntimeError("Cancelled")
+        self.docs_written = self.total_estimate or 0
+        self.bytes_written = self.path.stat().st_size
+
+    def _encode(self, batch: List[Dict[str, Any]], exporter: AdvancedExporter) -> bytes:
+        if self.format == "csv":
+            buf = io.StringIO()
+            writer = csv.DictWriter(buf, fieldnames=self.header, restval="", extrasaction="ignore")
+            writer.writerows(exporter._csv_row(doc) for doc in batch)
+            return buf.getvalue().encode("utf-8")
+        if self.format == "ndjson":
+            return "".join(exporter._json_item(doc, False) + "\n" for doc in batch).encode("utf-8")
+        parts = []
+        for i, doc in enumerate(batch):
+            if self.docs_written or i:
+                parts.append(exporter._json_sep(self.pretty))
+            else:
+                parts.append(exporter._json_first(self.pretty))
+            parts.append(exporter._json_item(doc, self.pretty))
+        return "".join(parts).encode("utf-8")
+
+    def _run_resumable(self, exporter: AdvancedExporter, mask, batch_size: int = 1000):
+        resume = self.last_id is not None and self.path.exists()
+        if self.format == "csv" and self.header is None:
+            self.header = exporter._csv_header(self.query, self.limit, self.fields, mask)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "r+b" if resume else "wb") as fh:
+            query = self.query
+            if resume:
+                # Drop anything written after the last checkpoint, then continue past its _id
+                fh.truncate(self.bytes_written)
+                fh.seek(self.bytes_written)
+                seek = after_id(self.last_id)
+                query = {"$and": [self.query, seek]} if self.query else seek
+                self.log(f"Resuming after _id {self.last_id} ({self.docs_written} documents already written)")
+            else:
+                self.docs_written = 0
+                self.last_id = None
+                if self.format == "csv":
+                    buf = io.StringIO()
+                    csv.DictWriter(buf, fieldnames=self.header).writeheader()
+                    fh.write(buf.getvalue().encode("utf-8"))
+                elif self.format == "json":
+                    fh.write(b"[")
+                self.bytes_written = fh.tell()
+                self.log(f"Exporting {self.format}...")
+
+            limit = self.limit - self.docs_written if self.limit else None
+            if limit is None or limit > 0:
+                cursor = exporter._find(query, limit, sort=[("_id", 1)])
+                for batch in exporter._iter_batches(cursor, batch_size):
+                    if self._cancel:
+                        raise RuntimeError("Cancelled")
+                    last_id = batch[-1].get("_id")
+                    if mask:
+                        batch = mask(batch)
+                    fh.write(self._encode(batch, exporter))
+                    fh.flush()
+                    self.docs_written += len(batch)
+                    self.bytes_written = fh.tell()
+                    self.last_id = last_id
+                    self.save()
+
+            if self.format == "json":
+                fh.write((b"\n]" if self.docs_written else b"]") if self.pretty else b"]")
+            self.bytes_written = fh.tell()
+
+
+class ExportJobManager:
+    def __init__(self):
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        # Jobs that were running when the backend stopped are marked interrupted
+        if not EXPORT_DIR.exists():
+            return
+        for rec_path in EXPORT_DIR.glob("*/job.json"):
+            try:
+                job = ExportJob.from_record(json_util.loads(rec_path.read_text("utf-8")))
+            except Exception:
+                continue
+            if job.status in ("pending", "running"):
+                job.status = "interrupted"
+                job.log("Backend restarted during export.")
+            self._jobs[job.id] = job
+
+    def create(self, client, connection_id: str, db: str, collection: str, fmt: str, query=None, limit=None,
+               pretty: bool = False, fields=None, mask=None, stages=None) -> ExportJob:
+        job = ExportJob(connection_id, db, collection, fmt, query, limit, pretty, fields)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.save()
+        job.start(client, mask, stages)
+        return job
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        out = []
+        for j in sorted(jobs, key=lambda j: j.created_at, reverse=True):
+            d = j.status_dict()
+            d.pop("logs", None)
+            out.append(d)
+        return out
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.get(job_id)
+        if not job:
+            return False
+        job._cancel = True
+        job.log("Cancellation requested by user.")
+        return True
+
+    def resume(self, job_id: str, client, mask=None, stages=None) -> Optional[ExportJob]:
+        job = self.get(job_id)
+        if not job:
+            return None
+        if job.status in ("running", "success"):
+            raise ValueError(f"Job is {job.status}")
+        job.start(client, mask, stages)
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if not job:
+            return False
+        job._cancel = True
+        if job._thread and job._thread.is_alive():
+            job._thread.join(timeout=5)
+        shutil.rmtree(job.dir, ignore_errors=True)
+        return True
+
+
+export_mgr = ExportJobManager()
@@ -0,0 +1,154 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+_RANGE_OPS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$regex", "$exists", "$type", "$not", "$elemMatch", "$all", "$size"}
+
+
+def classify_filter(query: Dict[str, Any]) -> Tuple[List[str], List[str], List[str]]:
+    """Split filter fields into (equality, range, unindexable) buckets for the ESR rule.
+    `$and` clauses are merged; `$or`/`$nor`/`$expr`/`$text` cannot feed a single compound index.
+    """
+    equality: List[str] = []
+    ranges: List[str] = []
+    other: List[str] = []
+
+    def visit(q: Dict[str, Any]):
+        for k, v in q.items():
+            if k == "$and" and isinstance(v, list):
+                for sub in v:
+                    if isinstance(sub, dict):
+                        visit(sub)
+                continue
+            if k.startswith("$"):
+                other.append(k)
+                continue
+            if isinstance(v, dict) and any(op.startswith("$") for op in v):
+                ops = set(v.keys())
+                if ops <= {"$eq", "$in"}:
+                    equality.append(k)
+                elif ops & _RANGE_OPS:
+                    ranges.append(k)
+                else:
+                    other.append(k)
+            else:
+                equality.append(k)
+
+    visit(query or {})
+    # A field that is both compared for equality and range acts as equality
+    ranges = [f for f in ranges if f not in equality]
+    return equality, ranges, other
+
+
+def esr_index(query: Dict[str, Any], sort_spec: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """Propose compound index keys ordered Equality → Sort → Range."""
+    equality, ranges, _ = classify_filter(query)
+    keys: List[Tuple[str, int]] = []
+    seen = set()
+    for f in equality:
+        if f not in seen:
+            keys.append((f, 1))
+            seen.add(f)
+    for f, d in sort_spec:
+        if f not in seen:
+            keys.append((f, 1 if d >= 0 else -1))
+            seen.add(f)
+    for f in ranges:
+        if f not in seen:
+            keys.append((f, 1))
+            seen.add(f)
+    # An index led by _id alone is the default one
+    if keys and keys[0][0] == "_id" and len(keys) == 1:
+        return []
+    return keys
+
+
+def _walk_stages(stage: Dict[str, Any], out: List[Dict[str, Any]]):
+    if not isinstance(stage, dict):
+        return
+    out.append(stage)
+    if "inputStage" in stage:
+        _walk_stages(stage["inputStage"], out)
+    for sub in stage.get("inputStages", []) or []:
+        _walk_stages(sub, out)
+    # Slot-based engine nests the classic tree under queryPlan
+    if "queryPlan" in stage:
+        _walk_stages(stage["queryPlan"], out)
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Extract the parts of an `executionStats` explain that matter for indexing."""
+    planner = explain.get("queryPlanner") or {}
+    winning = planner.get("winningPlan") or {}
+    stages: List[Dict[str, Any]] = []
+    _walk_stages(winning, stages)
+    names = [s.get("stage") for s in stages if s.get("stage")]
+    index_names = [s.get("indexName") for s in stages if s.get("stage") == "IXSCAN" and s.get("indexName")]
+
+    ex = explain.get("executionStats") or {}
+    n_returned = ex.get("nReturned", 0) or 0
+    docs = ex.get("totalDocsExamined", 0) or 0
+    keys = ex.get("totalKeysExamined", 0) or 0
+    denom = max(1, n_returned)
+    return {
+        "stages": names,
+        "collscan": "COLLSCAN" in names,
+        "ixscan": "IXSCAN" in names,
+        "indexesUsed": index_names,
+        "inMemorySort": "SORT" in names,
+        "nReturned": n_returned,
+        "docsExamined": docs,
+        "keysExamined": keys,
+        "docsExaminedPerReturned": round(docs / denom, 2),
+        "keysExaminedPerReturned": round(keys / denom, 2),
+        "executionTimeMillis": ex.get("executionTimeMillis"),
+        "winningPlan": winning,
+        "rejectedPlans": len(planner.get("rejectedPlans") or []),
+    }
+
+
+def _key_list(index: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    return list((index.get("key") or {}).items())
+
+
+def advise(query: Dict[str, Any], sort_spec: List[Tuple[str, int]], indexes: List[Dict[str, Any]], plan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Combine the ESR proposal with the existing indexes (and the plan summary when available).
+    Returns { keys, status, coveredBy, extends, issues, note } where status is one of
+    none | covered | create.
+    """
+    keys = esr_index(query, sort_spec)
+    _, _, unindexable = classify_filter(query)
+    issues: List[str] = []
+    if plan:
+        if plan["collscan"]:
+            issues.append("Collection scan: no index supports this filter")
+        if plan["inMemorySort"]:
+            issues.append("Blocking in-memory SORT stage")
+        if plan["docsExaminedPerReturned"] > 10:
+            issues.append(f"Examines {plan['docsExaminedPerReturned']} documents per document returned")
+    if unindexable:
+        issues.append(f"Operators {sorted(set(unindexable))} are not covered by the suggestion")
+
+    if not keys:
+        return {"keys": [], "status": "none", "coveredBy": None, "extends": [], "issues": issues,
+                "note": "No filter or sort fields to index"}
+
+    covered_by = None
+    extends: List[str] = []
+    for idx in indexes:
+        existing = _key_list(idx)
+        if existing[:len(keys)] == keys or existing[:len(keys)] == [(f, -d) for f, d in keys]:
+            covered_by = idx.get("name")
+            break
+        if len(existing) < len(keys) and keys[:len(existing)] == existing:
+            extends.append(idx.get("name"))
+
+    healthy = plan is not None and not plan["collscan"] and not plan["inMemorySort"] and plan["docsExaminedPerReturned"] <= 10
+    if covered_by:
+        status, note = "covered", f"Existing index '{covered_by}' already has this key prefix"
+    elif healthy:
+        status, note = "none", "Current plan is already efficient"
+    else:
+        status, note = "create", "Equality fields first, then sort fields, then range fields (ESR)"
+        if extends:
+            note += f"; would supersede {extends}"
+    return {"keys": keys, "status": status, "coveredBy": covered_by, "extends": extends, "issues": issues, "note": note}
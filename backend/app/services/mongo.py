@@ -1,43 +1,259 @@
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+import re
 import threading
+import time
 import uuid
 
 
+def normalize_uri(uri: str) -> str:
+    """Canonical form used to share one client between connections to the same deployment."""
+    uri = uri.strip()
+    scheme, sep, rest = uri.partition("://")
+    if not sep:
+        return uri
+    hosts, slash, tail = rest.partition("/")
+    creds, at, hostlist = hosts.rpartition("@")
+    hostlist = ",".join(sorted(h.strip().lower() for h in hostlist.split(",") if h.strip()))
+    tail = tail.rstrip("/")
+    return f"{scheme.lower()}://{creds}{at}{hostlist}{slash if tail else ''}{tail}"
+
+
+def redact_uri(uri: str) -> str:
+    return re.sub(r"://[^@/]+@", "://***@", uri)
+
+
+class PoolStats(ConnectionPoolListener):
+    """Connection pool counters collected from pymongo CMAP events."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failed = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+    def connection_created(self, event):
+        with self._lock:
+            self.created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def connection_checked_out(self, event):
+        # `duration` (seconds spent waiting in the queue) is reported by pymongo 4.7+
+        wait_ms = (getattr(event, "duration", None) or 0) * 1000
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failed += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "created": self.created,
+                "closed": self.closed,
+                "open": self.created - self.closed,
+                "checkedOut": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkoutFailed": self.checkout_failed,
+                "waitMsAvg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "waitMsMax": round(self.wait_ms_max, 3),
+            }
+
+
+class _PooledClient:
+    def __init__(self, uri: str, options: Dict[str, Any]) -> None:
+        self.uri = uri
+        self.options = options
+        self.stats = PoolStats()
+        self.client = MongoClient(uri, event_listeners=[self.stats], **options)
+        self.async_client: Optional[AsyncIOMotorClient] = None
+        self.conn_ids: set = set()
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self.async_client:
+            self.async_client.close()
+        self.client.close()
+
+
 class ConnectionManager:
     """
     Manages MongoClient instances in-memory.
+    Connections to the same normalized URI (and pool options) share one client; the client is
+    reference-counted by connection id. Connection ids are only released by `close`: scheduled
+    backups and background jobs hold them for hours. A client no id refers to is kept for reuse
+    until it has been idle for `idle_timeout` seconds or more than `max_idle_clients` are cached
+    (least recently used first); clients still referenced are never closed.
+    Each client also gets a lazily created Motor client for the async routers.
     For production, consider persistence and auth.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        idle_timeout: float = float(os.getenv("MONGO_CONN_IDLE_TIMEOUT", "1800")),
+        max_idle_clients: int = int(os.getenv("MONGO_MAX_IDLE_CLIENTS", "8")),
+        max_pool_size: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        min_pool_size: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    ) -> None:
         self._lock = threading.Lock()
-        self._clients: Dict[str, MongoClient] = {}
+        self._pool: Dict[Tuple, _PooledClient] = {}
+        self._conns: Dict[str, Tuple] = {}
+        self.idle_timeout = idle_timeout
+        self.max_idle_clients = max_idle_clients
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
 
-    def create(self, uri: str, server_selection_timeout_ms: int = 5000) -> str:
-        client = MongoClient(uri, serverSelectionTimeoutMS=server_selection_timeout_ms)
-        # Trigger server selection to validate connection
-        client.admin.command("ping")
+    def create(
+        self,
+        uri: str,
+        server_selection_timeout_ms: int = 5000,
+        max_pool_size: Optional[int] = None,
+        min_pool_size: Optional[int] = None,
+    ) -> str:
+        options = {
+            "serverSelectionTimeoutMS": server_selection_timeout_ms,
+            "maxPoolSize": max_pool_size if max_pool_size is not None else self.max_pool_size,
+            "minPoolSize": min_pool_size if min_pool_size is not None else self.min_pool_size,
+        }
+        key = (normalize_uri(uri), tuple(sorted(options.items())))
+        self._evict()
+        with self._lock:
+            pooled = self._pool.get(key)
+        if pooled is None:
+            pooled = _PooledClient(uri, options)
+            try:
+                # Trigger server selection to validate connection
+                pooled.client.admin.command("ping")
+            except Exception:
+                pooled.close()
+                raise
+            with self._lock:
+                existing = self._pool.get(key)
+                if existing is None:
+                    self._pool[key] = pooled
+                else:
+                    # lost a race with a concurrent /connect for the same URI
+                    pooled.close()
+                    pooled = existing
         conn_id = str(uuid.uuid4())
         with self._lock:
-            self._clients[conn_id] = client
+            pooled.conn_ids.add(conn_id)
+            pooled.last_used = time.monotonic()
+            self._conns[conn_id] = key
         return conn_id
 
+    def _touch(self, conn_id: str) -> Optional[_PooledClient]:
+        # caller holds the lock
+        key = self._conns.get(conn_id)
+        if key is None:
+            return None
+        pooled = self._pool[key]
+        pooled.last_used = time.monotonic()
+        return pooled
+
     def get(self, conn_id: str) -> Optional[MongoClient]:
         with self._lock:
-            return self._clients.get(conn_id)
+            pooled = self._touch(conn_id)
+            return pooled.client if pooled else None
+
+    def get_async(self, conn_id: str) -> Optional[AsyncIOMotorClient]:
+        """Return the Motor client for a connection, creating it on first use."""
+        with self._lock:
+            pooled = self._touch(conn_id)
+            if pooled is None:
+                return None
+            if pooled.async_client is None:
+                pooled.async_client = AsyncIOMotorClient(pooled.uri, event_listeners=[pooled.stats], **pooled.options)
+            return pooled.async_client
+
+    def _release(self, conn_id: str) -> bool:
+        # caller holds the lock; the client stays cached until evicted
+        key = self._conns.pop(conn_id, None)
+        if key is None:
+            return False
+        self._pool[key].conn_ids.discard(conn_id)
+        return True
 
     def close(self, conn_id: str) -> bool:
         with self._lock:
-            client = self._clients.pop(conn_id, None)
-        if client:
-            client.close()
-            return True
-        return False
+            ok = self._release(conn_id)
+        if ok:
+            self._evict()
+        return ok
+
+    def _evict(self) -> None:
+        """Close clients no connection id refers to that are idle or over the cap."""
+        now = time.monotonic()
+        to_close: List[_PooledClient] = []
+        with self._lock:
+            unused = sorted(
+                ((k, p) for k, p in self._pool.items() if not p.conn_ids),
+                key=lambda kp: kp[1].last_used,
+            )
+            excess = max(0, len(unused) - self.max_idle_clients)
+            for i, (k, p) in enumerate(unused):
+                if i < excess or (self.idle_timeout > 0 and now - p.last_used > self.idle_timeout):
+                    to_close.append(self._pool.pop(k))
+        for p in to_close:
+            p.close()
 
     def list_ids(self):
         with self._lock:
-            return list(self._clients.keys())
+            return list(self._conns.keys())
+
+    def pool_stats(self) -> List[Dict[str, Any]]:
+        self._evict()
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "uri": redact_uri(p.uri),
+                    "refs": len(p.conn_ids),
+                    "connectionIds": sorted(p.conn_ids),
+                    "idleSeconds": round(now - p.last_used, 1),
+                    "maxPoolSize": p.options.get("maxPoolSize"),
+                    "minPoolSize": p.options.get("minPoolSize"),
+                    "async": p.async_client is not None,
+                    "pool": p.stats.snapshot(),
+                }
+                for p in self._pool.values()
+            ]
 
 
 conn_mgr = ConnectionManager()
@@ -0,0 +1,118 @@
+from typing import Any, Dict, List, Optional, Tuple
+import base64
+
+import bson
+from pymongo import ASCENDING, DESCENDING
+
+
+def build_sort_spec(sort: Optional[List[List[Any]]]) -> List[Tuple[str, int]]:
+    """Normalize a request sort (e.g., [["field", 1], ["age", -1]]) into pymongo tuples."""
+    spec: List[Tuple[str, int]] = []
+    for item in sort or []:
+        if isinstance(item, list) and len(item) == 2:
+            field, direction = item
+            spec.append((str(field), ASCENDING if int(direction) >= 0 else DESCENDING))
+    return spec
+
+
+def keyset_sort_spec(sort: Optional[List[List[Any]]]) -> List[Tuple[str, int]]:
+    """Sort spec for keyset paging: the requested sort plus `_id` as a unique tie-breaker."""
+    spec = build_sort_spec(sort)
+    if not any(f == "_id" for f, _ in spec):
+        spec.append(("_id", ASCENDING))
+    return spec
+
+
+def get_path(doc: Dict[str, Any], path: str) -> Any:
+    cur: Any = doc
+    for part in path.split("."):
+        if not isinstance(cur, dict):
+            return None
+        cur = cur.get(part)
+    return cur
+
+
+def pop_path(doc: Dict[str, Any], path: str) -> None:
+    parts = path.split(".")
+    cur: Any = doc
+    for part in parts[:-1]:
+        if not isinstance(cur, dict):
+            return
+        cur = cur.get(part)
+    if isinstance(cur, dict):
+        cur.pop(parts[-1], None)
+
+
+def encode_cursor(doc: Dict[str, Any], spec: List[Tuple[str, int]]) -> str:
+    """Build an opaque continuation token from the last document of a page.
+    Values are BSON-encoded so ObjectId/datetime/Decimal128 keys round-trip exactly.
+    """
+    raw = bson.encode({
+        "s": [[f, d] for f, d in spec],
+        "v": [get_path(doc, f) for f, _ in spec],
+    })
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, spec: List[Tuple[str, int]]) -> List[Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = bson.decode(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor token")
+    if [tuple(x) for x in data.get("s", [])] != [tuple(x) for x in spec]:
+        raise ValueError("Cursor token does not match the requested sort")
+    values = data.get("v") or []
+    if len(values) != len(spec):
+        raise ValueError("Invalid cursor token")
+    return values
+
+
+def _after(field: str, direction: int, value: Any) -> Optional[Dict[str, Any]]:
+    # Null/missing sorts lowest in MongoDB and `$gt: null` matches nothing, so handle it explicitly
+    if value is None:
+        return {field: {"$ne": None}} if direction == ASCENDING else None
+    return {field: {"$gt" if direction == ASCENDING else "$lt": value}}
+
+
+def keyset_filter(query: Dict[str, Any], spec: List[Tuple[str, int]], values: List[Any]) -> Dict[str, Any]:
+    """Combine the user filter with a seek predicate that resumes strictly after `values`.
+    For sort (a, b, _id) this is: a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND _id > vid).
+    Fields holding mixed BSON types compare per type bracket, as in any MongoDB range query.
+    """
+    branches: List[Dict[str, Any]] = []
+    for i, (field, direction) in enumerate(spec):
+        cond = _after(field, direction, values[i])
+        if cond is None:
+            continue
+        branch = {f: values[j] for j, (f, _) in enumerate(spec[:i])}
+        branch.update(cond)
+        branches.append(branch)
+    # No branch left means nothing can sort after the token
+    seek: Dict[str, Any] = {"$or": branches} if branches else {"_id": {"$in": []}}
+    if not query:
+        return seek
+    return {"$and": [query, seek]}
+
+
+def keyset_projection(projection: Optional[Dict[str, Any]], spec: List[Tuple[str, int]]) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Make sure sort keys are fetched so the next token can be built.
+    Returns the adjusted projection and the fields to strip from the output again.
+    """
+    if not projection:
+        return projection, []
+    proj = dict(projection)
+    strip: List[str] = []
+    inclusive = any(v not in (0, False) for k, v in proj.items() if k != "_id")
+    for field, _ in spec:
+        if field == "_id":
+            if proj.get("_id") in (0, False):
+                proj.pop("_id")
+                strip.append("_id")
+        elif inclusive and field not in proj:
+            proj[field] = 1
+            strip.append(field)
+        elif not inclusive and proj.get(field) in (0, False):
+            proj.pop(field)
+            strip.append(field)
+    return proj, strip
@@ -1,25 +1,165 @@
 import threading
 import subprocess
-import tempfile
+import hashlib
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 import uuid
 import time
 
+from bson import json_util
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+
+from sync_engine import (
+    CHANGE_STREAM_HISTORY_LOST, ChangeStreamSync, NativeSyncEngine, RangeDiffSync, SyncCancelled, WatermarkSync,
+    largest_first,
+)
+
+from .sync_store import SyncStore
+
+SYNC_ENGINES = ("native", "tools")
+# full: one copy with drop; cdc: initial copy, then apply the change stream until cancelled;
+# incremental: upsert documents past a per-collection high-water mark (works on standalones);
+# diff: compare per-_id-range hashes and transfer only the ranges that differ
+SYNC_MODES = ("full", "cdc", "incremental", "diff")
+SYNC_STATE_DIR = Path(__file__).resolve().parent.parent / "sync_state"
+SYNC_LOG_DIR = SYNC_STATE_DIR / "logs"
+
+# mongodump/mongorestore progress: "[####....]  db.coll  12.0MB/48.0MB  (25.0%)" or "... 1200/4800  (25.0%)"
+_TOOL_PROGRESS_RE = re.compile(r"\[[#.]+\]\s+(\S+)\s+([\d.]+\s*[KMGT]?B?)/([\d.]+\s*[KMGT]?B?)\s+\(([\d.]+)%\)")
+_TOOL_DONE_RE = re.compile(r"(?:finished restoring|done dumping) (\S+) \((\d+) documents?")
+
+
+class LogBuffer:
+    """
+    Fixed-size ring buffer of numbered log lines. Every line is also appended to `path`,
+    so the full log survives on disk while memory stays bounded. The file stays open until
+    `close`; lines logged after that (e.g. cancelling a finished job) open, append and close it.
+    After `delete` lines only go to the ring.
+    """
+
+    def __init__(self, path: Path, maxlen: int = int(os.getenv("SYNC_LOG_BUFFER", "1000"))) -> None:
+        self.path = path
+        self._lines: deque = deque(maxlen=maxlen)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._fh = None
+        self._closed = False
+        self._deleted = False
+
+    def append(self, line: str) -> None:
+        with self._lock:
+            self._seq += 1
+            self._lines.append((self._seq, line))
+            if self._deleted:
+                return
+            try:
+                if self._closed:
+                    with open(self.path, "a", encoding="utf-8") as fh:
+                        fh.write(line + "\n")
+                    return
+                if self._fh is None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._fh = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._fh.write(line + "\n")
+            except OSError:
+                pass
+
+    def since(self, seq: int) -> List[Tuple[int, str]]:
+        with self._lock:
+            return [item for item in self._lines if item[0] > seq]
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    @property
+    def dropped(self) -> int:
+        """Lines that are only on disk any more"""
+        return self._seq - len(self._lines)
+
+    def __iter__(self):
+        with self._lock:
+            return iter([line for _, line in self._lines])
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def delete(self) -> None:
+        self.close()
+        with self._lock:
+            self._deleted = True
+            self.path.unlink(missing_ok=True)
+
+
 class SyncJob:
-    def __init__(self, source_uri: str, source_db: str, dest_uri: str, dest_db: str):
-        self.id = str(uuid.uuid4())
+    def __init__(self, source_uri: str, source_db: str, dest_uri: str, dest_db: str,
+                 engine: str = "native", workers: int = 4, batch_size: int = 1000, mode: str = "full",
+                 watermark_field: str = "_id", checkpoint_ids: bool = False, job_id: Optional[str] = None,
+                 store: Optional[SyncStore] = None):
+        if engine not in SYNC_ENGINES:
+            raise ValueError(f"Invalid engine. Use {'|'.join(SYNC_ENGINES)}")
+        if mode not in SYNC_MODES:
+            raise ValueError(f"Invalid mode. Use {'|'.join(SYNC_MODES)}")
+        if mode != "full" and engine != "native":
+            raise ValueError(f"{mode} mode requires the native engine")
+        self.id = job_id or str(uuid.uuid4())
         self.source_uri = source_uri
         self.source_db = source_db
         self.dest_uri = dest_uri
         self.dest_db = dest_db
-        self.logs: List[str] = []
+        self.engine = engine
+        self.workers = workers
+        self.batch_size = batch_size
+        self.mode = mode
+        self.phase: Optional[str] = None  # cdc: initial | streaming
+        self.watermark_field = watermark_field
+        self.checkpoint_ids = checkpoint_ids
+        self.marks: Dict[str, object] = {}
+        self._marks_lock = threading.Lock()
+        self.logs = LogBuffer(SYNC_LOG_DIR / f"{self.id}.log")
         self.status: str = "pending"  # pending | running | success | error
         self.error: Optional[str] = None
         self._thread: Optional[threading.Thread] = None
         self.progress: int = 0  # 0..100
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
         self._cancel: bool = False
-        self._current_proc: Optional[subprocess.Popen] = None
+        self._procs: Set[subprocess.Popen] = set()
+        self._tool_collections: Dict[str, Dict] = {}
+        self._native: Optional[NativeSyncEngine] = None
+        self._stream: Optional[ChangeStreamSync] = None
+        self._store = store
+        # per-collection checkpoints of an interrupted run, loaded by SyncJobManager.resume_interrupted
+        self._resume: Dict[str, Dict] = {}
+
+    def definition(self) -> Dict[str, Any]:
+        """Constructor arguments, as persisted in the job store"""
+        return {
+            "source_uri": self.source_uri, "source_db": self.source_db,
+            "dest_uri": self.dest_uri, "dest_db": self.dest_db,
+            "engine": self.engine, "workers": self.workers, "batch_size": self.batch_size,
+            "mode": self.mode, "watermark_field": self.watermark_field, "checkpoint_ids": self.checkpoint_ids,
+        }
+
+    def _resume_options(self) -> Dict[str, Any]:
+        if not self._store:
+            return {}
+        return {"resume": self._resume, "on_checkpoint": self._on_checkpoint, "checkpoint_ids": self.checkpoint_ids}
+
+    def _on_checkpoint(self, collection: str, last_id, docs: int, done: bool):
+        self._store.checkpoint(self.id, collection, last_id, docs, done)
 
     def log(self, msg: str):
         ts = time.strftime("%H:%M:%S")
@@ -31,16 +171,18 @@ class SyncJob:
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
 
-    def _run_cmd(self, args: List[str]):
-        # Run a command and stream stdout/stderr to logs
+    def _run_cmd(self, args: List[str], prefix: str = "", stdin=None):
+        # Run a command and stream stdout/stderr to logs; safe to call from several workers
+        proc = None
         try:
             proc = subprocess.Popen(
                 args,
+                stdin=stdin,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 text=True,
             )
-            self._current_proc = proc
+            self._procs.add(proc)
             assert proc.stdout is not None
             for line in iter(proc.stdout.readline, ''):
                 if self._cancel:
@@ -49,64 +191,177 @@ class SyncJob:
                     except Exception:
                         pass
                     raise RuntimeError("Cancelled")
-                self.log(line.rstrip())
+                self._tool_output(prefix, line.rstrip())
             proc.wait()
             if proc.returncode != 0:
                 raise subprocess.CalledProcessError(proc.returncode, args)
         except Exception as e:
             raise e
         finally:
-            self._current_proc = None
+            if proc is not None:
+                self._procs.discard(proc)
+
+    def _run_pipe(self, producer: List[str], consumer: List[str], prefix: str = ""):
+        """Run `producer | consumer` (e.g. mongodump --archive | mongorestore --archive); both log."""
+        proc = subprocess.Popen(producer, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._procs.add(proc)
+        reader = threading.Thread(
+            target=lambda: [self._tool_output(prefix, raw.decode("utf-8", "replace").rstrip()) for raw in iter(proc.stderr.readline, b"")],
+            daemon=True,
+        )
+        reader.start()
+        try:
+            self._run_cmd(consumer, prefix, stdin=proc.stdout)
+        except Exception:
+            if proc.poll() is None:
+                proc.terminate()
+            raise
+        finally:
+            proc.stdout.close()
+            proc.wait()
+            reader.join(timeout=5)
+            self._procs.discard(proc)
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, producer)
+
+    def _tool_output(self, prefix: str, line: str):
+        """Log a line of mongodump/mongorestore output and pick per-collection progress out of it."""
+        self.log(prefix + line)
+        m = _TOOL_PROGRESS_RE.search(line)
+        if m:
+            stats = self._tool_collections.get(m.group(1).split(".", 1)[-1])
+            if stats is not None:
+                # byte sizes come from mongorestore, plain counts from mongodump
+                key = "pct" if m.group(2).rstrip().endswith("B") else "dumpPct"
+                stats[key] = float(m.group(4))
+            return
+        m = _TOOL_DONE_RE.search(line)
+        if m:
+            stats = self._tool_collections.get(m.group(1).split(".", 1)[-1])
+            if stats is not None:
+                stats["docs"] = int(m.group(2))
+                if "finished restoring" in line:
+                    stats["pct"] = 100.0
+
+    def telemetry(self) -> Dict[str, Any]:
+        """Structured progress: documents, bytes, per-collection percentages, throughput and ETA."""
+        now = time.time()
+        elapsed = ((self.finished_at or now) - self.started_at) if self.started_at else 0.0
+        docs = total_docs = done_bytes = total_bytes = 0
+        if self._native:
+            totals = self._native.totals()
+            docs, total_docs, done_bytes = totals["docs"], totals["total"], totals["bytes"]
+            collections = {
+                name: {k: c.get(k) for k in ("status", "pct", "docs", "total", "bytes", "docsPerSec")}
+                for name, c in self._native.collections.items()
+            }
+            pct = 100.0 * docs / total_docs if total_docs else 0.0
+        else:
+            collections = {}
+            for name, c in self._tool_collections.items():
+                size = c.get("sizeBytes") or 0
+                c_pct = 100.0 if c["status"] == "done" else (c.get("pct") or 0.0)
+                total_bytes += size
+                done_bytes += int(size * c_pct / 100)
+                total_docs += c.get("count") or 0
+                docs += c.get("docs") or 0
+                collections[name] = {"status": c["status"], "pct": c_pct, "dumpPct": c.get("dumpPct"), "sizeBytes": size}
+            pct = 100.0 * done_bytes / total_bytes if total_bytes else 0.0
+        if self.status == "success" or self.phase == "streaming":
+            pct = 100.0
+        if self.status == "running":
+            self.progress = max(self.progress, min(99, int(pct)))
+        docs_rate = docs / elapsed if elapsed > 0 else None
+        bytes_rate = done_bytes / elapsed if elapsed > 0 else None
+        eta = None
+        if self.status == "running" and 0 < pct < 100:
+            eta = round(elapsed * (100 - pct) / pct, 1)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "mode": self.mode,
+            "engine": self.engine,
+            "phase": self.phase,
+            "progress": round(pct, 1),
+            "docs": docs,
+            "totalDocs": total_docs or None,
+            "bytes": done_bytes,
+            "totalBytes": total_bytes or None,
+            "docsPerSec": round(docs_rate, 1) if docs_rate is not None else None,
+            "bytesPerSec": round(bytes_rate, 1) if bytes_rate is not None else None,
+            "etaSeconds": eta,
+            "elapsedSeconds": round(elapsed, 1),
+            "collections": collections,
+            "cdc": self.cdc_stats(),
+            "lastLogSeq": self.logs.last_seq,
+        }
+
+    def collections(self) -> Dict[str, Dict]:
+        """Per-collection progress (native: docs, total, bytes, docsPerSec, pct; tools: phase, sizeBytes, elapsed)"""
+        return dict(self._native.collections) if self._native else dict(self._tool_collections)
+
+    def cdc_stats(self) -> Optional[Dict]:
+        """Change stream counters: received, applied, batches, lagSeconds, lagEvents, lastEventAt"""
+        return dict(self._stream.stats) if self._stream else None
+
+    @property
+    def checkpoint_path(self) -> Path:
+        # keyed by the sync definition, so starting the same sync again picks up its checkpoint
+        parts = [self.source_uri, self.source_db, self.dest_uri, self.dest_db]
+        if self.mode == "incremental":
+            parts.append(self.watermark_field)
+        key = "|".join(parts)
+        return SYNC_STATE_DIR / f"{self.mode}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.json"
+
+    def _load_checkpoint(self) -> Optional[Dict]:
+        try:
+            return json_util.loads(self.checkpoint_path.read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write_checkpoint(self, state: Dict):
+        SYNC_STATE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json_util.dumps({
+            **state,
+            "sourceDb": self.source_db,
+            "destDb": self.dest_db,
+            "savedAt": time.time(),
+        }), "utf-8")
+        os.replace(tmp, self.checkpoint_path)
+
+    def _save_checkpoint(self, token):
+        self._write_checkpoint({"resumeToken": token})
+
+    def _save_mark(self, collection: str, value):
+        with self._marks_lock:
+            self.marks[collection] = value
+            # json_util keeps the mark's BSON type (datetime, ObjectId, ...)
+            self._write_checkpoint({"field": self.watermark_field, "marks": self.marks})
+
+    def _native_log(self, msg: str):
+        self.log(msg)
+        totals = self._native.totals() if self._native else None
+        if totals and totals["total"]:
+            self.progress = min(99, 5 + int(90 * totals["docs"] / totals["total"]))
 
     def _run(self):
         self.status = "running"
+        self.started_at = time.time()
+        if self._store:
+            self._store.set_status(self.id, "running")
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                dump_dir = Path(temp_dir)
-                dump_path_db = dump_dir / self.source_db
-
-                self.log("[1/4] Dumping from source...")
-                self.progress = 10
-                self._run_cmd([
-                    'mongodump',
-                    f'--uri={self.source_uri}',
-                    f'--db={self.source_db}',
-                    f'--out={dump_dir}',
-                ])
-
-                self.log("[2/4] Converting BSON to JSON...")
-                self.progress = 35
-                for bson_file in dump_path_db.glob("*.bson"):
-                    self._run_cmd(['bsondump', f'--outFile={bson_file.with_suffix(".json")}', str(bson_file)])
-                    if self._cancel:
-                        raise RuntimeError("Cancelled")
-
-                self.log("[3/4] Importing data...")
-                self.progress = 60
-                for json_file in dump_path_db.glob("*.json"):
-                    if not json_file.name.endswith('.metadata.json'):
-                        self._run_cmd([
-                            'mongoimport',
-                            f'--uri={self.dest_uri}',
-                            f'--db={self.dest_db}',
-                            f'--collection={json_file.stem}',
-                            '--mode=upsert',
-                            '--drop',
-                            f'--file={json_file}',
-                        ])
-                        if self._cancel:
-                            raise RuntimeError("Cancelled")
-
-                self.log("[4/4] Restoring indexes ...")
-                self.progress = 85
-                self._run_cmd([
-                    'mongorestore',
-                    f'--uri={self.dest_uri}',
-                    f'--nsFrom={self.source_db}.*',
-                    f'--nsTo={self.dest_db}.*',
-                    str(dump_dir),
-                ])
-
+            if self.mode == "cdc":
+                self._run_cdc()
+            elif self.mode == "incremental":
+                self._run_incremental()
+            elif self.mode == "diff":
+                self._run_diff()
+            elif self.engine == "native":
+                self._run_native()
+            else:
+                self._run_tools()
             self.log("Sync completed successfully.")
             self.status = "success"
             self.progress = 100
@@ -115,30 +370,271 @@ class SyncJob:
             self.log(f"ERROR: {e}")
             self.status = "error"
             # if cancelled, reflect in status
-            if isinstance(e, RuntimeError) and str(e) == "Cancelled":
+            if isinstance(e, SyncCancelled) or (isinstance(e, RuntimeError) and str(e) == "Cancelled"):
                 self.status = "error"
                 self.error = "Cancelled by user"
+        finally:
+            self.finished_at = time.time()
+            if self._store:
+                self._store.set_status(self.id, self.status, self.error, self.finished_at)
+            self.logs.close()
+
+    def _run_native(self):
+        source = MongoClient(self.source_uri, serverSelectionTimeoutMS=5000)
+        dest = MongoClient(self.dest_uri, serverSelectionTimeoutMS=5000)
+        try:
+            self._native = NativeSyncEngine(
+                source, self.source_db, dest, self.dest_db,
+                workers=self.workers, batch_size=self.batch_size,
+                log=self._native_log, should_cancel=lambda: self._cancel,
+                **self._resume_options(),
+            )
+            self.progress = 5
+            self._native.run()
+            totals = self._native.totals()
+            self.log(f"Copied {totals['docs']} documents ({totals['bytes']} bytes)")
+        finally:
+            source.close()
+            dest.close()
+
+    def _run_incremental(self):
+        state = self._load_checkpoint() or {}
+        self.marks = dict(state.get("marks") or {})
+        if self.marks:
+            self.log(f"Copying documents with {self.watermark_field} >= last mark for {len(self.marks)} collections")
+        else:
+            self.log(f"No marks for {self.watermark_field} yet, copying everything")
+        source = MongoClient(self.source_uri, serverSelectionTimeoutMS=5000)
+        dest = MongoClient(self.dest_uri, serverSelectionTimeoutMS=5000)
+        try:
+            self._native = WatermarkSync(
+                source, self.source_db, dest, self.dest_db,
+                field=self.watermark_field, marks=self.marks, on_mark=self._save_mark,
+                workers=self.workers, batch_size=self.batch_size,
+                log=self._native_log, should_cancel=lambda: self._cancel,
+                **self._resume_options(),
+            )
+            self.progress = 5
+            self._native.run()
+            totals = self._native.totals()
+            self.log(f"Upserted {totals['docs']} documents ({totals['bytes']} bytes)")
+        finally:
+            source.close()
+            dest.close()
+
+    def _run_diff(self):
+        source = MongoClient(self.source_uri, serverSelectionTimeoutMS=5000)
+        dest = MongoClient(self.dest_uri, serverSelectionTimeoutMS=5000)
+        try:
+            self._native = RangeDiffSync(
+                source, self.source_db, dest, self.dest_db,
+                workers=self.workers, batch_size=self.batch_size,
+                log=self._native_log, should_cancel=lambda: self._cancel,
+                **self._resume_options(),
+            )
+            self.progress = 5
+            collections = self._native.run()
+            upserted = sum(c.get("upserted", 0) for c in collections.values())
+            deleted = sum(c.get("deleted", 0) for c in collections.values())
+            self.log(f"Diff applied: {upserted} documents upserted, {deleted} deleted")
+        finally:
+            source.close()
+            dest.close()
+
+    def _run_cdc(self):
+        source = MongoClient(self.source_uri, serverSelectionTimeoutMS=5000)
+        dest = MongoClient(self.dest_uri, serverSelectionTimeoutMS=5000)
+        try:
+            self._stream = ChangeStreamSync(
+                source, self.source_db, dest, self.dest_db,
+                batch_size=self.batch_size, log=self.log,
+                should_cancel=lambda: self._cancel, checkpoint=self._save_checkpoint,
+            )
+            state = self._load_checkpoint()
+            token = state.get("resumeToken") if state else None
+            if token is None or state.get("copyPending"):
+                self.phase = "initial"
+                if token is None:
+                    # position taken before the copy; events during the copy are replayed idempotently
+                    token = self._stream.current_token()
+                    self._write_checkpoint({"resumeToken": token, "copyPending": True})
+                self._native = NativeSyncEngine(
+                    source, self.source_db, dest, self.dest_db,
+                    workers=self.workers, batch_size=self.batch_size,
+                    log=self._native_log, should_cancel=lambda: self._cancel,
+                    **self._resume_options(),
+                )
+                self.progress = 5
+                self._native.run()
+                self._save_checkpoint(token)
+                self.log("Initial copy finished, tailing change stream...")
+            else:
+                self.log(f"Resuming change stream from checkpoint {self.checkpoint_path.name}")
+            self.phase = "streaming"
+            self.progress = 100
+            try:
+                self._stream.run(token)
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    # the token fell off the oplog: the next start does a full copy
+                    self.checkpoint_path.unlink(missing_ok=True)
+                raise
+            self.log("Change stream stopped; the resume token is kept for the next start.")
+        finally:
+            source.close()
+            dest.close()
+
+    def _run_tools(self):
+        # One mongodump --archive | mongorestore --archive pipe per collection on a worker pool,
+        # largest collections first; BSON is restored as-is (no JSON round trip)
+        source = MongoClient(self.source_uri, serverSelectionTimeoutMS=5000)
+        try:
+            specs = [spec for spec in source[self.source_db].list_collections() if not spec["name"].startswith("system.")]
+            views = [spec for spec in specs if spec.get("type") == "view"]
+            plan = largest_first(source[self.source_db], [spec["name"] for spec in specs if spec.get("type") != "view"])
+        finally:
+            source.close()
+        for p in plan:
+            self._tool_collections[p["name"]] = {"status": "pending", "phase": None, "sizeBytes": p["size"], "count": p["count"], "elapsed": 0.0}
+        finished = [p for p in plan if (self._resume.get(p["name"]) or {}).get("done")]
+        for p in finished:
+            self._tool_collections[p["name"]].update({"status": "done", "skipped": True, "pct": 100.0})
+        if finished:
+            self.log(f"Skipping {len(finished)} collections finished before the restart")
+        total_size = sum(p["size"] or 0 for p in plan) or 1
+        done_size = [0]
+        done_lock = threading.Lock()
+
+        def transfer(p: Dict):
+            name = p["name"]
+            stats = self._tool_collections[name]
+            if self._cancel:
+                raise RuntimeError("Cancelled")
+            t0 = time.perf_counter()
+            stats["status"], stats["phase"] = "running", "transfer"
+            # dump and restore overlap through the pipe; nothing is written to disk
+            self._run_pipe([
+                'mongodump',
+                f'--uri={self.source_uri}',
+                f'--db={self.source_db}',
+                f'--collection={name}',
+                '--archive',
+            ], [
+                'mongorestore',
+                f'--uri={self.dest_uri}',
+                f'--nsFrom={self.source_db}.*',
+                f'--nsTo={self.dest_db}.*',
+                '--drop',
+                '--archive',
+            ], prefix=f"[{name}] ")
+            stats["status"], stats["phase"] = "done", None
+            stats["elapsed"] = round(time.perf_counter() - t0, 3)
+            if self._store:
+                self._store.checkpoint(self.id, name, docs=stats.get("docs") or 0, done=True)
+            with done_lock:
+                done_size[0] += p["size"] or 0
+                self.progress = min(99, 5 + int(90 * done_size[0] / total_size))
+
+        self.log(f"Transferring {len(plan)} collections with {self.workers} workers (largest first)...")
+        self.progress = 5
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(transfer, p) for p in plan if p not in finished]
+            try:
+                for f in futures:
+                    f.result()
+            except Exception:
+                self._cancel_workers(futures)
+                raise
+
+        if views:
+            dest = MongoClient(self.dest_uri, serverSelectionTimeoutMS=5000)
+            try:
+                for spec in views:
+                    dest[self.dest_db].drop_collection(spec["name"])
+                    dest[self.dest_db].create_collection(spec["name"], **spec["options"])
+                    self.log(f"View {spec['name']} recreated")
+            finally:
+                dest.close()
+
+    def _cancel_workers(self, futures):
+        for f in futures:
+            f.cancel()
+        for proc in list(self._procs):
+            if proc.poll() is None:
+                try:
+                    proc.terminate()
+                except Exception:
+                    pass
 
 class SyncJobManager:
-    def __init__(self):
+    """
+    In-memory registry of sync jobs. Finished jobs (and their spilled logs) are dropped
+    `retention` seconds after they end.
+    """
+
+    def __init__(self, retention: float = float(os.getenv("SYNC_JOB_RETENTION", "3600")), store: Optional[SyncStore] = None):
         self._jobs: Dict[str, SyncJob] = {}
         self._lock = threading.Lock()
+        self.retention = retention
+        self._store = store
+
+    def resume_interrupted(self) -> int:
+        """Restart jobs the store still has as pending/running; finished collections are skipped."""
+        if not self._store:
+            return 0
+        n = 0
+        for rec in self._store.unfinished():
+            with self._lock:
+                if rec["id"] in self._jobs:
+                    continue
+            try:
+                job = SyncJob(**rec["definition"], job_id=rec["id"], store=self._store)
+            except (TypeError, ValueError) as e:
+                self._store.set_status(rec["id"], "error", f"Cannot resume: {e}", time.time())
+                continue
+            job._resume = self._store.checkpoints(job.id)
+            job.log(f"Resuming after backend restart ({sum(1 for c in job._resume.values() if c['done'])} collections already done)")
+            with self._lock:
+                self._jobs[job.id] = job
+            job.start()
+            n += 1
+        return n
 
-    def create(self, source_uri: str, source_db: str, dest_uri: str, dest_db: str) -> SyncJob:
-        job = SyncJob(source_uri, source_db, dest_uri, dest_db)
+    def _gc(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [j for j in self._jobs.values() if j.finished_at and now - j.finished_at > self.retention]
+            for j in expired:
+                self._jobs.pop(j.id, None)
+        for j in expired:
+            j.logs.delete()
+            if self._store:
+                self._store.delete_job(j.id)
+
+    def create(self, source_uri: str, source_db: str, dest_uri: str, dest_db: str,
+               engine: str = "native", workers: int = 4, batch_size: int = 1000, mode: str = "full",
+               watermark_field: str = "_id", checkpoint_ids: bool = False) -> SyncJob:
+        self._gc()
+        job = SyncJob(source_uri, source_db, dest_uri, dest_db, engine=engine, workers=workers,
+                      batch_size=batch_size, mode=mode, watermark_field=watermark_field,
+                      checkpoint_ids=checkpoint_ids, store=self._store)
+        if self._store:
+            self._store.save_job(job.id, job.definition(), job.status)
         with self._lock:
             self._jobs[job.id] = job
         job.start()
         return job
 
     def get(self, job_id: str) -> Optional[SyncJob]:
+        self._gc()
         with self._lock:
             return self._jobs.get(job_id)
 
-    def list(self) -> List[Dict[str, str]]:
+    def list(self) -> List[Dict[str, Any]]:
+        self._gc()
         with self._lock:
             return [
-                {"id": j.id, "status": j.status, "error": j.error}
+                {"id": j.id, "status": j.status, "error": j.error, "mode": j.mode, "progress": j.progress}
                 for j in self._jobs.values()
             ]
 
@@ -148,12 +644,13 @@ class SyncJobManager:
         if not job:
             return False
         job._cancel = True
-        if job._current_proc and job._current_proc.poll() is None:
-            try:
-                job._current_proc.terminate()
-            except Exception:
-                pass
+        for proc in list(job._procs):
+            if proc.poll() is None:
+                try:
+                    proc.terminate()
+                except Exception:
+                    pass
         job.log("Cancellation requested by user.")
         return True
 
-sync_mgr = SyncJobManager()
+sync_mgr = SyncJobManager(store=SyncStore(SYNC_STATE_DIR / "sync_jobs.sqlite3"))
@@ -0,0 +1,120 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import bson
+
+from .mongo import redact_uri
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_jobs (
+    id TEXT PRIMARY KEY,
+    definition TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+    job_id TEXT NOT NULL REFERENCES sync_jobs(id) ON DELETE CASCADE,
+    collection TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    last_id BLOB,
+    docs INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, collection)
+);
+"""
+
+
+class SyncStore:
+    """
+    SQLite store for sync job definitions and per-collection checkpoints
+    (collection finished, last `_id` copied). `last_id` is kept as BSON so any `_id` type round-trips.
+    WAL mode keeps a checkpoint per batch cheap; one connection is shared behind a lock.
+    Definitions carry the full URIs (needed to resume), so the database is created 0600 (SQLite
+    gives its -wal/-shm files the same mode) and credentials are scrubbed once a job finishes.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        for f in (path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")):
+            if f.exists():
+                os.chmod(f, 0o600)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+        self._scrub_finished()
+
+    def save_job(self, job_id: str, definition: Dict[str, Any], status: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sync_jobs (id, definition, status, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET definition = excluded.definition, status = excluded.status",
+                (job_id, json.dumps(definition), status, time.time()),
+            )
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None, finished_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE sync_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, finished_at, job_id),
+            )
+        if finished_at is not None:
+            self._scrub_finished(job_id)
+
+    def _scrub_finished(self, job_id: Optional[str] = None) -> None:
+        """Replace the credentials in finished jobs' URIs with *** (they are never resumed)"""
+        sql = "SELECT id, definition FROM sync_jobs WHERE status NOT IN ('pending', 'running')"
+        with self._lock:
+            if job_id is None:
+                rows = self._db.execute(sql).fetchall()
+            else:
+                rows = self._db.execute(sql + " AND id = ?", (job_id,)).fetchall()
+            for job_id, raw in rows:
+                definition = json.loads(raw)
+                scrubbed = {k: redact_uri(v) if k.endswith("_uri") and isinstance(v, str) else v
+                            for k, v in definition.items()}
+                if scrubbed != definition:
+                    self._db.execute("UPDATE sync_jobs SET definition = ? WHERE id = ?", (json.dumps(scrubbed), job_id))
+
+    def delete_job(self, job_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sync_jobs WHERE id = ?", (job_id,))
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        """Jobs that were pending or running when the process stopped: [{ id, definition }]"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, definition FROM sync_jobs WHERE status IN ('pending', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [{"id": r[0], "definition": json.loads(r[1])} for r in rows]
+
+    def checkpoint(self, job_id: str, collection: str, last_id: Any = None, docs: int = 0, done: bool = False) -> None:
+        raw = bson.encode({"v": last_id}) if last_id is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sync_checkpoints (job_id, collection, done, last_id, docs, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id, collection) DO UPDATE SET done = excluded.done, "
+                "last_id = COALESCE(excluded.last_id, sync_checkpoints.last_id), docs = excluded.docs, updated_at = excluded.updated_at",
+                (job_id, collection, int(done), raw, int(docs), time.time()),
+            )
+
+    def checkpoints(self, job_id: str) -> Dict[str, Dict[str, Any]]:
+        """collection -> { done, lastId, docs }"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT collection, done, last_id, docs FROM sync_checkpoints WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {
+            coll: {"done": bool(done), "lastId": bson.decode(raw)["v"] if raw is not None else None, "docs": docs}
+            for coll, done, raw, docs in rows
+        }
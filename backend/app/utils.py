@@ -1,11 +1,19 @@
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+from collections.abc import Mapping
+import base64
+import json
+import math
+import uuid
 from bson import ObjectId
+from bson.binary import Binary
 from bson.decimal128 import Decimal128
+from bson.timestamp import Timestamp
 from datetime import datetime
+from fastapi.responses import JSONResponse
 
 
-def to_jsonable(obj: Any) -> Any:
-    """Recursively convert Mongo objects (e.g., ObjectId) to JSON-serializable types."""
+def _bson_default(obj: Any) -> Any:
+    """`default` hook for json.dumps: convert BSON leaf types, raise TypeError for anything else."""
     if isinstance(obj, ObjectId):
         return str(obj)
     if isinstance(obj, Decimal128):
@@ -16,8 +24,81 @@ def to_jsonable(obj: Any) -> Any:
             return str(obj)
     if isinstance(obj, datetime):
         return obj.isoformat()
+    if isinstance(obj, (Binary, bytes)):
+        return base64.b64encode(bytes(obj)).decode("ascii")
+    if isinstance(obj, Timestamp):
+        return {"t": obj.time, "i": obj.inc}
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, Mapping):
+        # e.g. RawBSONDocument: its values are decoded lazily as the encoder walks it
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def to_jsonable(obj: Any) -> Any:
+    """Recursively convert Mongo objects (e.g., ObjectId) to JSON-serializable types."""
     if isinstance(obj, dict):
         return {k: to_jsonable(v) for k, v in obj.items()}
     if isinstance(obj, list):
         return [to_jsonable(i) for i in obj]
-    return obj
+    if isinstance(obj, float) and not math.isfinite(obj):
+        # NaN/Infinity are not valid JSON
+        return None
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    try:
+        return to_jsonable(_bson_default(obj))
+    except TypeError:
+        return obj
+
+
+def dumps_bson(obj: Any) -> bytes:
+    """Encode documents straight to JSON bytes in one pass.
+    The C json encoder walks dicts/lists itself and only calls back for BSON types,
+    so nothing is copied the way `to_jsonable` rebuilds every container.
+    Output matches `to_jsonable` + json.dumps: NaN/Infinity become null. Documents holding
+    them are rare, so they are only handled by re-encoding through `to_jsonable` on failure.
+    """
+    try:
+        out = json.dumps(obj, default=_bson_default, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+    except ValueError:
+        out = json.dumps(to_jsonable(obj), ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+    return out.encode("utf-8")
+
+
+class BSONJSONResponse(JSONResponse):
+    """JSONResponse that serializes Mongo documents with `dumps_bson`, skipping jsonable_encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bson(content)
+
+
+def iter_ndjson(
+    docs: Iterable[Dict[str, Any]],
+    transform: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    batch_size: int = 500,
+) -> Iterator[bytes]:
+    """Encode documents as NDJSON, yielding one chunk per `batch_size` documents.
+    Each document is converted as soon as it is read, so memory stays bounded by one batch.
+    A failure mid-stream is reported as a final `{"error": ...}` line.
+    """
+    buf = []
+    try:
+        for doc in docs:
+            if transform:
+                doc = transform(doc)
+            buf.append(dumps_bson(doc).decode("utf-8"))
+            if len(buf) >= batch_size:
+                yield ("\n".join(buf) + "\n").encode("utf-8")
+                buf = []
+        if buf:
+            yield ("\n".join(buf) + "\n").encode("utf-8")
+    except Exception as e:
+        if buf:
+            yield ("\n".join(buf) + "\n").encode("utf-8")
+        yield (json.dumps({"error": str(e)}) + "\n").encode("utf-8")
+    finally:
+        close = getattr(docs, "close", None)
+        if close:
+            close()
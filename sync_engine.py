@@ -0,0 +1,617 @@
+# Native Sync Engine for MongoDB Sync Tool Pro
+import datetime
+import re
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import DeleteOne, IndexModel, ReplaceOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+RAW_CODEC = CodecOptions(document_class=RawBSONDocument)
+# Stay well below the 48MB message limit while keeping batches large
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+DUPLICATE_KEY = 11000
+NAMESPACE_NOT_FOUND = 26
+CHANGE_STREAM_HISTORY_LOST = 286
+# largest 31-bit prime; per-document hashes are reduced modulo it before summing
+HASH_MODULUS = 2147483647
+
+
+class SyncCancelled(Exception):
+    pass
+
+
+def collection_size(db, name: str) -> Dict[str, Optional[int]]:
+    """Document count and uncompressed data size from collStats (None when unavailable)."""
+    try:
+        stats = db.command("collStats", name)
+        return {"count": int(stats.get("count", 0)), "size": int(stats.get("size", 0))}
+    except Exception:
+        return {"count": None, "size": None}
+
+
+# BSON comparison order of the type brackets an `_id` can fall in ($type aliases)
+_TYPE_ORDER = [["minKey"], ["null"], ["number"], ["string", "symbol"], ["object"], ["binData"],
+               ["objectId"], ["bool"], ["date"], ["timestamp"], ["regex"], ["maxKey"]]
+
+
+def _type_alias(value: Any) -> Optional[str]:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float, bson.Int64, bson.Decimal128)):
+        return "number"
+    for cls, alias in ((bson.ObjectId, "objectId"), (str, "string"), (datetime.datetime, "date"),
+                       ((bytes, bson.Binary, uuid.UUID), "binData"), (Mapping, "object"),
+                       (bson.Timestamp, "timestamp"), ((bson.Regex, re.Pattern), "regex"),
+                       (bson.MinKey, "minKey"), (bson.MaxKey, "maxKey")):
+        if isinstance(value, cls):
+            return alias
+    return None
+
+
+def after_id(last_id: Any) -> Dict[str, Any]:
+    """Filter for documents after `last_id` in `_id` order.
+
+    `$gt` only compares within one BSON type, so `_id`s in the type brackets that sort after
+    `last_id`'s are matched explicitly; collections mixing ObjectId and string/int ids resume
+    without skipping or repeating documents.
+    """
+    alias = _type_alias(last_id)
+    later = next((sum(_TYPE_ORDER[i + 1:], []) for i, group in enumerate(_TYPE_ORDER) if alias in group), [])
+    if not later:
+        return {"_id": {"$gt": last_id}}
+    return {"$or": [{"_id": {"$gt": last_id}}, {"_id": {"$type": later}}]}
+
+
+def _get_path(doc: Mapping, path: str) -> Any:
+    """Value at a dotted path through embedded documents (None when missing or behind an array)."""
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, Mapping):
+            return None
+        value = value.get(part)
+    return value
+
+
+def largest_first(db, names: List[str]) -> List[Dict[str, Any]]:
+    """collStats-based work plan, biggest collections first so they start on free workers."""
+    plan = [{"name": n, **collection_size(db, n)} for n in names]
+    plan.sort(key=lambda p: p["size"] or 0, reverse=True)
+    return plan
+
+
+class NativeSyncEngine:
+    """Copy a database between two MongoClients without touching disk.
+
+    Documents are read as RawBSONDocument and written unchanged with unordered insert_many,
+    so every BSON type survives the copy. Collections are copied on a thread pool; their
+    indexes are built after the data is loaded, and views are recreated last.
+    """
+
+    def __init__(self, source_client, source_db: str, dest_client, dest_db: str, workers: int = 4,
+                 batch_size: int = 1000, drop: bool = True, log: Optional[Callable[[str], None]] = None,
+                 should_cancel: Optional[Callable[[], bool]] = None,
+                 resume: Optional[Dict[str, Dict[str, Any]]] = None,
+                 on_checkpoint: Optional[Callable[[str, Any, int, bool], None]] = None,
+                 checkpoint_ids: bool = False):
+        self.source = source_client[source_db]
+        self.dest = dest_client[dest_db]
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.drop = drop
+        self.log = log or (lambda msg: None)
+        self.should_cancel = should_cancel or (lambda: False)
+        # name -> { done, lastId, docs } from an interrupted run; finished collections are skipped
+        self.resume = resume or {}
+        # on_checkpoint(name, last_id, docs, done): when a collection is done, and after every batch
+        # with `checkpoint_ids`. That reads in _id order (an index walk, slower than natural order)
+        # so an interrupted collection resumes after its last _id instead of being copied again.
+        self.on_checkpoint = on_checkpoint
+        self.checkpoint_ids = checkpoint_ids
+        self._lock = threading.Lock()
+        # name -> { status, docs, total, sizeBytes, bytes, elapsed, docsPerSec, pct }
+        self.collections: Dict[str, Dict[str, Any]] = {}
+
+    def plan(self, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """listCollections entries to copy (system collections are skipped)"""
+        specs = []
+        for spec in self.source.list_collections():
+            name = spec["name"]
+            if name.startswith("system.") or (names is not None and name not in names):
+                continue
+            specs.append(spec)
+        return specs
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            stats = list(self.collections.values())
+        return {
+            "docs": sum(s["docs"] for s in stats),
+            "total": sum(s["total"] or 0 for s in stats),
+            "bytes": sum(s["bytes"] for s in stats),
+        }
+
+    def run(self, names: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        specs = self.plan(names)
+        collections = [s for s in specs if s.get("type", "collection") != "view"]
+        views = [s for s in specs if s.get("type") == "view"]
+        # schedule largest first: the long tail of small collections fills in around them
+        by_name = {spec["name"]: spec for spec in collections}
+        plan = largest_first(self.source, list(by_name))
+        collections = [by_name[p["name"]] for p in plan]
+        for p in plan:
+            self.collections[p["name"]] = {"status": "pending", "docs": 0, "total": p["count"], "sizeBytes": p["size"],
+                                           "bytes": 0, "elapsed": 0.0, "docsPerSec": None, "pct": 0.0}
+        finished = [spec for spec in collections if (self.resume.get(spec["name"]) or {}).get("done")]
+        for spec in finished:
+            stats = self.collections[spec["name"]]
+            stats.update({"status": "done", "skipped": True, "pct": 100.0,
+                          "docs": self.resume[spec["name"]].get("docs") or stats["total"] or 0})
+        if finished:
+            self.log(f"Skipping {len(finished)} collections finished before the restart")
+        collections = [spec for spec in collections if spec not in finished]
+
+        self.log(f"Copying {len(collections)} collections with {self.workers} workers...")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._copy_tracked, spec) for spec in collections]
+            for f in futures:
+                f.result()
+
+        for spec in views:
+            self._check_cancel()
+            self._prepare_dest(spec)
+            self.log(f"View {spec['name']} recreated")
+        return self.collections
+
+    def _copy_tracked(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        stats = self.copy_collection(spec)
+        if self.on_checkpoint:
+            self.on_checkpoint(spec["name"], None, stats["docs"], True)
+        return stats
+
+    def _check_cancel(self):
+        if self.should_cancel():
+            raise SyncCancelled("Cancelled")
+
+    def _prepare_dest(self, spec: Dict[str, Any]):
+        name = spec["name"]
+        if self.drop:
+            self.dest.drop_collection(name)
+        if name not in self.dest.list_collection_names(filter={"name": name}):
+            self.dest.create_collection(name, **(spec.get("options") or {}))
+
+    def copy_collection(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        name = spec["name"]
+        stats = self.collections[name]
+        stats["status"] = "running"
+        t0 = time.perf_counter()
+        try:
+            self._check_cancel()
+            last_id = (self.resume.get(name) or {}).get("lastId")
+            query: Dict[str, Any] = {}
+            if last_id is None:
+                self._prepare_dest(spec)
+            else:
+                # continue an interrupted copy: keep what is there, read on from the checkpoint
+                query = after_id(last_id)
+                stats["docs"] = self.resume[name].get("docs") or 0
+                self.log(f"{name}: resuming after _id {last_id!r}")
+            src = self.source.get_collection(name, codec_options=RAW_CODEC)
+            dst = self.dest.get_collection(name, codec_options=RAW_CODEC)
+            # _id order (via the _id index) only when checkpointing or resuming; natural order is cheaper otherwise
+            sort = [("_id", 1)] if self.checkpoint_ids or last_id is not None else None
+            batch: List[RawBSONDocument] = []
+            size = 0
+            for doc in src.find(query, batch_size=self.batch_size, sort=sort):
+                batch.append(doc)
+                size += len(doc.raw)
+                if len(batch) >= self.batch_size or size >= MAX_BATCH_BYTES:
+                    self._check_cancel()
+                    self._insert(dst, batch)
+                    self._count(stats, len(batch), size, t0)
+                    self._checkpoint(name, batch[-1], stats)
+                    batch, size = [], 0
+            if batch:
+                self._insert(dst, batch)
+                self._count(stats, len(batch), size, t0)
+                self._checkpoint(name, batch[-1], stats)
+
+            self._check_cancel()
+            n_idx = self._copy_indexes(name)
+            stats["status"] = "done"
+            stats["pct"] = 100.0
+            stats["elapsed"] = round(time.perf_counter() - t0, 3)
+            self.log(f"{name}: {stats['docs']} documents, {n_idx} indexes in {stats['elapsed']}s ({stats['docsPerSec'] or 0} docs/s)")
+            return stats
+        except Exception:
+            stats["status"] = "error"
+            raise
+
+    def _checkpoint(self, name: str, last: RawBSONDocument, stats: Dict[str, Any]):
+        if self.on_checkpoint and self.checkpoint_ids:
+            self.on_checkpoint(name, last["_id"], stats["docs"], False)
+
+    def _insert(self, dst, batch: List[RawBSONDocument]):
+        try:
+            dst.insert_many(batch, ordered=False, bypass_document_validation=True)
+        except BulkWriteError as bwe:
+            # documents already present (copy without drop) are left as they are
+            errors = [e for e in bwe.details.get("writeErrors", []) if e.get("code") != DUPLICATE_KEY]
+            if errors:
+                raise
+
+    def _count(self, stats: Dict[str, Any], n: int, size: int, t0: float):
+        with self._lock:
+            stats["docs"] += n
+            stats["bytes"] += size
+            elapsed = time.perf_counter() - t0
+            stats["elapsed"] = round(elapsed, 3)
+            stats["docsPerSec"] = round(stats["docs"] / elapsed, 1) if elapsed > 0 else None
+            if stats["total"]:
+                stats["pct"] = round(min(100.0, 100.0 * stats["docs"] / stats["total"]), 1)
+
+    def _copy_indexes(self, name: str) -> int:
+        models = []
+        for idx in self.source[name].list_indexes():
+            if idx.get("name") == "_id_":
+                continue
+            opts = {k: v for k, v in idx.items() if k not in ("v", "key", "ns")}
+            models.append(IndexModel(list(idx["key"].items()), **opts))
+        if models:
+            self.dest[name].create_indexes(models)
+        return len(models)
+
+
+class WatermarkSync(NativeSyncEngine):
+    """Incremental copy driven by a per-collection high-water mark on `field`.
+
+    Each collection is read with `{field: {$gte: mark}}` in `field` order and upserted by _id,
+    so only documents written since the previous run move. `$gte` re-sends the documents
+    sitting on the mark (harmless upserts) instead of losing ties split across batches.
+    `field` may be a dotted path into embedded documents (e.g. `meta.updatedAt`); array values
+    never advance the mark. `on_mark(collection, value)` is called after every applied batch.
+    With `_id` as the field only inserts are picked up (ObjectIds grow with their timestamp);
+    deletes are never propagated, and documents without the field are only copied by the first run.
+    """
+
+    def __init__(self, source_client, source_db: str, dest_client, dest_db: str, field: str = "_id",
+                 marks: Optional[Dict[str, Any]] = None, on_mark: Optional[Callable[[str, Any], None]] = None, **kwargs):
+        kwargs["drop"] = False
+        super().__init__(source_client, source_db, dest_client, dest_db, **kwargs)
+        self.field = field
+        self.marks: Dict[str, Any] = dict(marks or {})
+        self.on_mark = on_mark or (lambda name, value: None)
+
+    def copy_collection(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        name = spec["name"]
+        stats = self.collections[name]
+        stats["status"] = "running"
+        t0 = time.perf_counter()
+        try:
+            self._check_cancel()
+            self._prepare_dest(spec)
+            mark = self.marks.get(name)
+            query = {self.field: {"$gte": mark}} if mark is not None else {}
+            src = self.source.get_collection(name, codec_options=RAW_CODEC)
+            dst = self.dest.get_collection(name, codec_options=RAW_CODEC)
+            stats["total"] = src.count_documents(query)
+            cursor = src.find(query, batch_size=self.batch_size, sort=[(self.field, 1)], allow_disk_use=True)
+            batch: List[ReplaceOne] = []
+            size = 0
+            for doc in cursor:
+                batch.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+                size += len(doc.raw)
+                value = _get_path(doc, self.field)
+                if value is not None and not isinstance(value, list):
+                    mark = value
+                if len(batch) >= self.batch_size or size >= MAX_BATCH_BYTES:
+                    self._check_cancel()
+                    self._upsert(dst, name, batch, mark)
+                    self._count(stats, len(batch), size, t0)
+                    batch, size = [], 0
+            if batch:
+                self._upsert(dst, name, batch, mark)
+                self._count(stats, len(batch), size, t0)
+
+            n_idx = self._copy_indexes(name) if name not in self.marks else 0
+            stats["status"] = "done"
+            stats["pct"] = 100.0
+            stats["elapsed"] = round(time.perf_counter() - t0, 3)
+            self.log(f"{name}: {stats['docs']} documents since {self.field}={self.marks.get(name)!r}, {n_idx} indexes in {stats['elapsed']}s")
+            return stats
+        except Exception:
+            stats["status"] = "error"
+            raise
+
+    def _upsert(self, dst, name: str, batch: List[ReplaceOne], mark: Any):
+        dst.bulk_write(batch, ordered=False, bypass_document_validation=True)
+        if mark is not None:
+            self.on_mark(name, mark)
+
+
+class RangeDiffSync(NativeSyncEngine):
+    """Bring the destination in line by transferring only `_id` ranges whose content differs.
+
+    Each collection is split into `partitions` `_id` ranges (boundaries sampled from the
+    source). Both sides compute count, summed `$toHashedIndexKey` of each document and
+    summed `$bsonSize` per range on the server. Ranges that match are skipped. Ranges that
+    differ are bisected at their median `_id` until at most `leaf_size` documents remain,
+    then per-document hashes are compared and only missing/changed documents are upserted
+    and extra ones deleted. Needs MongoDB 6.0+ on both sides.
+    """
+
+    def __init__(self, source_client, source_db: str, dest_client, dest_db: str, partitions: int = 16,
+                 leaf_size: int = 1000, **kwargs):
+        kwargs["drop"] = False
+        super().__init__(source_client, source_db, dest_client, dest_db, **kwargs)
+        self.partitions = max(1, partitions)
+        self.leaf_size = max(1, leaf_size)
+
+    @staticmethod
+    def _range_filter(lo: Any, hi: Any) -> Dict[str, Any]:
+        # Bounds share one BSON type; `$not: {$gte}` keeps ids of other types in the first range
+        if lo is None and hi is None:
+            return {}
+        if lo is None:
+            return {"_id": {"$not": {"$gte": hi}}}
+        if hi is None:
+            return {"_id": {"$gte": lo}}
+        return {"_id": {"$gte": lo, "$lt": hi}}
+
+    @staticmethod
+    def _summary(col, filt: Dict[str, Any]) -> Tuple[int, int, int]:
+        rows = list(col.aggregate([
+            {"$match": filt},
+            {"$group": {
+                "_id": None,
+                "n": {"$sum": 1},
+                # modulo keeps the 64-bit hashes summable without overflowing to double
+                "h": {"$sum": {"$mod": [{"$toHashedIndexKey": "$$ROOT"}, HASH_MODULUS]}},
+                "b": {"$sum": {"$bsonSize": "$$ROOT"}},
+            }},
+        ], allowDiskUse=True))
+        if not rows:
+            return 0, 0, 0
+        return int(rows[0]["n"]), int(rows[0]["h"]), int(rows[0]["b"])
+
+    def _bounds(self, src) -> List[Any]:
+        if self.partitions == 1:
+            return []
+        ids = [d["_id"] for d in src.aggregate([
+            {"$sample": {"size": self.partitions * 32}},
+            {"$project": {"_id": 1}},
+        ])]
+        # Range splits only make sense within one BSON type
+        if not ids or len({type(v) for v in ids}) > 1:
+            return []
+        try:
+            ids.sort()
+        except TypeError:
+            return []
+        step = len(ids) / self.partitions
+        return sorted({ids[int(i * step)] for i in range(1, self.partitions)} - {ids[0]})
+
+    def _midpoint(self, col, filt: Dict[str, Any], n: int, lo: Any, bound_type: Optional[type]) -> Any:
+        doc = next(iter(col.find(filt, {"_id": 1}).sort("_id", 1).skip(n // 2).limit(1)), None)
+        mid = doc["_id"] if doc else None
+        if mid is None or mid == lo or (bound_type is not None and type(mid) is not bound_type):
+            return None
+        return mid
+
+    def copy_collection(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        name = spec["name"]
+        stats = self.collections[name]
+        stats.update({"status": "running", "ranges": 0, "rangesDiffering": 0, "upserted": 0, "deleted": 0})
+        t0 = time.perf_counter()
+        try:
+            self._check_cancel()
+            self._prepare_dest(spec)
+            src = self.source.get_collection(name, codec_options=RAW_CODEC)
+            dst = self.dest.get_collection(name, codec_options=RAW_CODEC)
+            bounds = self._bounds(self.source[name])
+            bound_type = type(bounds[0]) if bounds else None
+            edges = [None] + bounds + [None]
+            stack = list(zip(edges, edges[1:]))[::-1]
+            while stack:
+                self._check_cancel()
+                lo, hi = stack.pop()
+                filt = self._range_filter(lo, hi)
+                s_sum, d_sum = self._summary(self.source[name], filt), self._summary(self.dest[name], filt)
+                stats["ranges"] += 1
+                if s_sum == d_sum:
+                    self._count(stats, s_sum[0], 0, t0)
+                    continue
+                stats["rangesDiffering"] += 1
+                n = max(s_sum[0], d_sum[0])
+                mid = None
+                if n > self.leaf_size:
+                    mid = self._midpoint(self.source[name] if s_sum[0] >= d_sum[0] else self.dest[name], filt, n, lo, bound_type)
+                if mid is None:
+                    size = self._reconcile(src, dst, filt, stats)
+                    self._count(stats, s_sum[0], size, t0)
+                else:
+                    bound_type = bound_type or type(mid)
+                    stack.extend([(mid, hi), (lo, mid)])
+
+            try:
+                self._copy_indexes(name)
+            except OperationFailure as e:
+                self.log(f"{name}: indexes not copied ({e})")
+            stats["status"] = "done"
+            stats["pct"] = 100.0
+            stats["elapsed"] = round(time.perf_counter() - t0, 3)
+            self.log(f"{name}: {stats['rangesDiffering']}/{stats['ranges']} ranges differed, "
+                     f"{stats['upserted']} upserted, {stats['deleted']} deleted in {stats['elapsed']}s")
+            return stats
+        except Exception:
+            stats["status"] = "error"
+            raise
+
+    def _doc_hashes(self, col, filt: Dict[str, Any]) -> Dict[bytes, Tuple[Any, int]]:
+        out = {}
+        for d in col.aggregate([{"$match": filt}, {"$project": {"_id": 1, "h": {"$toHashedIndexKey": "$$ROOT"}}}],
+                               allowDiskUse=True):
+            # encoded {_id} is a hashable key for any _id type, embedded documents included
+            out[bson.encode({"_id": d["_id"]})] = (d["_id"], d["h"])
+        return out
+
+    def _reconcile(self, src, dst, filt: Dict[str, Any], stats: Dict[str, Any]) -> int:
+        """Upsert documents missing or different on the destination, delete extra ones; returns bytes sent."""
+        s_hashes = self._doc_hashes(src, filt)
+        d_hashes = self._doc_hashes(dst, filt)
+        upsert_ids = [v[0] for k, v in s_hashes.items() if d_hashes.get(k, (None, None))[1] != v[1]]
+        delete_ids = [v[0] for k, v in d_hashes.items() if k not in s_hashes]
+        size = 0
+        for i in range(0, len(upsert_ids), self.batch_size):
+            docs = list(src.find({"_id": {"$in": upsert_ids[i:i + self.batch_size]}}))
+            if docs:
+                dst.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs],
+                               ordered=False, bypass_document_validation=True)
+                size += sum(len(d.raw) for d in docs)
+        for i in range(0, len(delete_ids), self.batch_size):
+            dst.delete_many({"_id": {"$in": delete_ids[i:i + self.batch_size]}})
+        with self._lock:
+            stats["upserted"] += len(upsert_ids)
+            stats["deleted"] += len(delete_ids)
+        return size
+
+
+class ChangeStreamSync:
+    """Apply a database-level change stream to the destination in batched bulk_writes.
+
+    Inserts, updates and replaces become upserts of the looked-up full document and deletes
+    become DeleteOne, so replaying events already covered by the initial copy is harmless.
+    Only the last event per document key is kept in a batch, which lets batches run
+    unordered. `checkpoint(token)` is called after each applied batch and periodically while
+    idle, so the stored token never points past unapplied events.
+    Needs a replica set or sharded cluster as source.
+    """
+
+    def __init__(self, source_client, source_db: str, dest_client, dest_db: str, batch_size: int = 500,
+                 flush_interval: float = 1.0, log: Optional[Callable[[str], None]] = None,
+                 should_cancel: Optional[Callable[[], bool]] = None,
+                 checkpoint: Optional[Callable[[Any], None]] = None):
+        # raw events keep fullDocument as the original BSON bytes
+        self.source = source_client[source_db].with_options(codec_options=RAW_CODEC)
+        self.dest_client = dest_client
+        self.dest = dest_client[dest_db]
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.log = log or (lambda msg: None)
+        self.should_cancel = should_cancel or (lambda: False)
+        self.checkpoint = checkpoint or (lambda token: None)
+        # lagEvents: events read from the stream but not yet applied to the destination
+        self.stats: Dict[str, Any] = {"received": 0, "applied": 0, "batches": 0, "lagSeconds": None, "lagEvents": 0, "lastEventAt": None}
+
+    def current_token(self):
+        """Resume token for "now", taken before an initial copy so no event is missed."""
+        with self.source.watch(max_await_time_ms=1) as cs:
+            cs.try_next()
+            return cs.resume_token
+
+    def run(self, resume_token=None):
+        """Tail the stream until cancelled."""
+        pending: Dict[str, Dict[bytes, Any]] = {}
+        last_flush = last_idle_checkpoint = time.monotonic()
+        with self.source.watch(full_document="updateLookup", resume_after=resume_token,
+                               batch_size=self.batch_size, max_await_time_ms=int(self.flush_interval * 1000)) as cs:
+            while not self.should_cancel():
+                event = cs.try_next()
+                now = time.monotonic()
+                if event is not None:
+                    self.stats["received"] += 1
+                    self._lag(event)
+                    if not self._queue(event, pending):
+                        # DDL events apply in stream order, after everything before them
+                        self._flush(pending)
+                        self._apply_ddl(event)
+                        pending = {}
+                        self.checkpoint(cs.resume_token)
+                        last_flush = now
+                        continue
+                n_pending = self.stats["lagEvents"]
+                if n_pending and (event is None or n_pending >= self.batch_size or now - last_flush >= self.flush_interval):
+                    self._flush(pending)
+                    pending = {}
+                    self.checkpoint(cs.resume_token)
+                    last_flush = now
+                elif event is None:
+                    self.stats["lagSeconds"] = 0
+                    # the post-batch token keeps advancing while idle; store it so it stays inside the oplog window
+                    if now - last_idle_checkpoint >= 30:
+                        self.checkpoint(cs.resume_token)
+                        last_idle_checkpoint = now
+            self._flush(pending)
+            self.checkpoint(cs.resume_token)
+
+    def _lag(self, event):
+        wall = event.get("wallTime")  # MongoDB 6.0+
+        if isinstance(wall, datetime.datetime):
+            ts = wall.replace(tzinfo=wall.tzinfo or datetime.timezone.utc).timestamp()
+        else:
+            ct = event.get("clusterTime")
+            ts = ct.time if ct is not None else time.time()
+        self.stats["lagSeconds"] = round(max(0.0, time.time() - ts), 3)
+        self.stats["lastEventAt"] = ts
+
+    def _queue(self, event, pending: Dict[str, Dict[bytes, Any]]) -> bool:
+        """Add a CRUD event to the pending batch; returns False for events that need _apply_ddl."""
+        op = event["operationType"]
+        if op not in ("insert", "update", "replace", "delete"):
+            return False
+        coll = event["ns"]["coll"]
+        key = event["documentKey"]
+        if op == "delete":
+            write = DeleteOne(key)
+        else:
+            doc = event.get("fullDocument")
+            # None when the document was deleted before the lookup; its delete event follows
+            write = ReplaceOne(key, doc, upsert=True) if doc is not None else None
+        batch = pending.setdefault(coll, {})
+        batch.pop(key.raw, None)
+        if write is not None:
+            batch[key.raw] = write
+        self.stats["lagEvents"] += 1
+        return True
+
+    def _flush(self, pending: Dict[str, Dict[bytes, Any]]):
+        n = self.stats["lagEvents"]
+        for coll, writes in pending.items():
+            if writes:
+                self.dest[coll].bulk_write(list(writes.values()), ordered=False, bypass_document_validation=True)
+        if n:
+            self.stats["applied"] += n
+            self.stats["batches"] += 1
+            self.stats["lagEvents"] = 0
+
+    def _apply_ddl(self, event):
+        op = event["operationType"]
+        if op == "drop":
+            self.dest.drop_collection(event["ns"]["coll"])
+        elif op == "rename":
+            to = event["to"]
+            if to["db"] == self.source.name:
+                try:
+                    self.dest[event["ns"]["coll"]].rename(to["coll"], dropTarget=True)
+                except OperationFailure as e:
+                    if e.code != NAMESPACE_NOT_FOUND:
+                        raise
+            else:
+                self.dest.drop_collection(event["ns"]["coll"])
+        elif op == "dropDatabase":
+            self.dest_client.drop_database(self.dest.name)
+        elif op == "invalidate":
+            raise RuntimeError("Change stream invalidated (source database dropped or renamed)")
+        else:
+            return
+        self.stats["applied"] += 1
+        self.log(f"Applied {op} on {event['ns'].get('coll', self.dest.name)}")